@@ -0,0 +1,71 @@
+import argparse
+import sys
+
+from .datasets import DATASETS
+from .suite import compare, load, run, save
+
+
+def _size(text: str) -> int:
+    multipliers = {'k': 1000, 'm': 1000000}
+    text = text.strip().lower()
+    if text and text[-1] in multipliers:
+        return int(text[:-1]) * multipliers[text[-1]]
+    return int(text)
+
+
+def _print_result(result: dict):
+    peak = f"{result['peak_bytes'] / 2 ** 20:10.1f} MiB" if result['peak_bytes'] is not None else ''
+    print(f"{result['dataset']:<10} {result['size']:>10} {result['operation']:<22}"
+          f"{result['ops_per_sec']:>14.0f} ops/s {result['ns_per_op']:>14.0f} ns/op {peak}", flush=True)
+
+
+def _run(args) -> int:
+    results = run(args.datasets, args.sizes, progress=_print_result, imports=not args.no_import, lookups=args.lookups,
+                  budget=args.budget, memory=not args.no_memory, seed=args.seed)
+    save(results, args.output)
+    return 0
+
+
+def _compare(args) -> int:
+    regressions = 0
+    for comparison in compare(load(args.baseline), load(args.current), args.threshold):
+        memory = f"{comparison['memory_change']:+8.1%}" if comparison['memory_change'] is not None else ''
+        flag = 'REGRESSION' if comparison['regression'] else ''
+        print(f"{comparison['dataset']:<10} {comparison['size']:>10} {comparison['operation']:<22}"
+              f"time {comparison['time_change']:+8.1%}  memory {memory:>8}  {flag}")
+        regressions += comparison['regression']
+    print(f'{regressions} regression(s) over {args.threshold:.0%}')
+    return 1 if regressions else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='Run the benchmarks and save the results as JSON')
+    run_parser.add_argument('-o', '--output', default='benchmark_results.json', help='Results file (default: %(default)s)')
+    run_parser.add_argument('--datasets', type=lambda text: text.split(','), default=list(DATASETS),
+                            help=f"Comma separated datasets (default: {','.join(DATASETS)})")
+    run_parser.add_argument('--sizes', type=lambda text: [_size(size) for size in text.split(',')],
+                            default=[10000, 100000], help='Comma separated sizes, e.g. 10k,100k,1m,10m (default: 10k,100k)')
+    run_parser.add_argument('--lookups', type=int, default=10000, help='Lookups in the skewed workload (default: %(default)s)')
+    run_parser.add_argument('--budget', type=float, default=2.0,
+                            help='Seconds each lookup and delete benchmark may take (default: %(default)s)')
+    run_parser.add_argument('--no-memory', action='store_true', help='Skip the peak memory passes')
+    run_parser.add_argument('--no-import', action='store_true', help='Skip the import time benchmarks')
+    run_parser.add_argument('--seed', type=int, default=0, help='Seed of the datasets (default: %(default)s)')
+    run_parser.set_defaults(func=_run)
+
+    compare_parser = commands.add_parser('compare', help='Flag regressions against a baseline')
+    compare_parser.add_argument('baseline', help='Baseline results file')
+    compare_parser.add_argument('current', help='Results file to check')
+    compare_parser.add_argument('--threshold', type=float, default=0.10,
+                                help='Relative slowdown or memory growth flagged (default: %(default)s)')
+    compare_parser.set_defaults(func=_compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
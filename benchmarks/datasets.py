@@ -0,0 +1,109 @@
+import ipaddress
+import random
+
+# Share of IPv6 prefixes by length, roughly following the global BGP table
+IPV6_BGP_LENGTHS = {
+    48: 0.45, 32: 0.12, 44: 0.08, 40: 0.07, 29: 0.05, 36: 0.04, 46: 0.04,
+    47: 0.03, 28: 0.03, 45: 0.03, 33: 0.02, 34: 0.02, 42: 0.02,
+}
+
+
+def ipv4_24(count: int, seed: int = 0) -> list[str]:
+    """
+    Generates distinct random IPv4 /24 subnets.
+
+    Args:
+        count (int): The number of subnets.
+        seed (int): The seed of the random generator.
+
+    Returns:
+        list: The subnets.
+    """
+    rng = random.Random(seed)
+    return [f'{n >> 16}.{(n >> 8) & 255}.{n & 255}.0/24' for n in rng.sample(range(1 << 24), count)]
+
+
+def ipv4_32(count: int, seed: int = 0) -> list[str]:
+    """
+    Generates distinct random IPv4 addresses as /32 subnets.
+
+    Args:
+        count (int): The number of subnets.
+        seed (int): The seed of the random generator.
+
+    Returns:
+        list: The subnets.
+    """
+    rng = random.Random(seed)
+    return [f'{n >> 24}.{(n >> 16) & 255}.{(n >> 8) & 255}.{n & 255}/32' for n in rng.sample(range(1 << 32), count)]
+
+
+def ipv6_bgp(count: int, seed: int = 0) -> list[str]:
+    """
+    Generates distinct random global unicast IPv6 subnets with a BGP-like prefix length distribution.
+
+    Args:
+        count (int): The number of subnets.
+        seed (int): The seed of the random generator.
+
+    Returns:
+        list: The subnets.
+    """
+    rng = random.Random(seed)
+    lengths = list(IPV6_BGP_LENGTHS)
+    weights = list(IPV6_BGP_LENGTHS.values())
+    seen = set()
+    result = []
+    while len(result) < count:
+        length = rng.choices(lengths, weights)[0]
+        # 2000::/3, with every bit past the prefix length cleared
+        network = ((1 << 125) | rng.getrandbits(125)) >> (128 - length) << (128 - length)
+        if (network, length) in seen:
+            continue
+        seen.add((network, length))
+        result.append(f'{ipaddress.IPv6Address(network)}/{length}')
+    return result
+
+
+def skewed_lookups(prefixes: list[str], count: int, seed: int = 0, skew: float = 4.0) -> list[str]:
+    """
+    Draws a lookup workload from the prefixes where a few prefixes are looked up most of the time.
+
+    Args:
+        prefixes (list): The prefixes to draw from.
+        count (int): The number of lookups.
+        seed (int): The seed of the random generator.
+        skew (float): How strongly lookups favour the first prefixes, 1 for uniform.
+
+    Returns:
+        list: The lookups.
+    """
+    rng = random.Random(seed)
+    n = len(prefixes)
+    return [prefixes[min(n - 1, int(n * rng.random() ** skew))] for _ in range(count)]
+
+
+def covering_prefixes(prefixes: list[str], bits: int = 8) -> list[str]:
+    """
+    Derives the distinct supernets `bits` shorter than the prefixes, so that lookups hit nested prefixes.
+
+    Args:
+        prefixes (list): The prefixes to cover.
+        bits (int): How many bits shorter the supernets are, prefixes shorter than that are skipped.
+
+    Returns:
+        list: The supernets, in order of first appearance.
+    """
+    result = {}
+    for prefix in prefixes:
+        network = ipaddress.ip_network(prefix)
+        if network.prefixlen >= bits:
+            result.setdefault(str(network.supernet(prefixlen_diff=bits)), None)
+    return list(result)
+
+
+DATASETS = {
+    'ipv4-24': (ipv4_24, False),
+    'ipv4-32': (ipv4_32, False),
+    'ipv6-bgp': (ipv6_bgp, True),
+}
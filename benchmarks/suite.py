@@ -0,0 +1,270 @@
+import json
+import os
+import pickle
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import ip_subnet_trie
+from ip_subnet_trie import IPv4SubnetTrie, IPv6SubnetTrie, IPSubnetJsonSerializer, IPSubnetProtobufSerializer
+
+from .datasets import DATASETS, covering_prefixes, skewed_lookups
+
+# Statements timed in a fresh interpreter
+IMPORTS = {
+    'import_trie': 'from ip_subnet_trie import IPv4SubnetTrie',
+    # The protobuf runtime is only loaded once the serializer is first used
+    'import_protobuf_serializer': 'from ip_subnet_trie import IPv4SubnetTrie, IPSubnetProtobufSerializer; '
+                                  'IPSubnetProtobufSerializer().serialize(IPv4SubnetTrie())',
+}
+
+
+def _timed(fn, items, budget: float = None) -> tuple:
+    """
+    Calls fn on every item, stopping early once the time budget is spent.
+
+    Args:
+        fn (callable): The operation.
+        items (list): The items to call it on.
+        budget (float): The time budget in seconds, or None to call it on every item.
+
+    Returns:
+        tuple: The number of calls made and the seconds they took.
+    """
+    done = 0
+    start = time.perf_counter()
+    deadline = start + budget if budget is not None else None
+    for item in items:
+        fn(item)
+        done += 1
+        if deadline is not None and not done & 63 and time.perf_counter() > deadline:
+            break
+    return done, time.perf_counter() - start
+
+
+def _peak_memory(fn, items) -> int:
+    """
+    Calls fn on every item under tracemalloc.
+
+    Returns:
+        int: The peak number of bytes allocated meanwhile.
+    """
+    tracemalloc.start()
+    try:
+        for item in items:
+            fn(item)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _result(dataset: str, size: int, operation: str, ops: int, seconds: float, peak_bytes: int) -> dict:
+    return {
+        'dataset': dataset,
+        'size': size,
+        'operation': operation,
+        'ops': ops,
+        'seconds': seconds,
+        'ops_per_sec': ops / seconds if seconds else 0.0,
+        'ns_per_op': seconds * 1e9 / ops if ops else 0.0,
+        'peak_bytes': peak_bytes,
+    }
+
+
+def run_dataset(dataset: str, size: int, lookups: int = 10000, budget: float = 2.0, memory: bool = True,
+                memory_sample: int = 1000, seed: int = 0) -> list[dict]:
+    """
+    Benchmarks every operation on one dataset.
+
+    Lookups and deletes stop early once their time budget is spent, so the
+    larger sizes finish in bounded time; ops/sec and ns/op are computed from
+    the calls actually made. Peak memory is measured in a separate pass under
+    tracemalloc: over the whole dataset for insert and the serializers, and
+    over at most `memory_sample` items, and no more than the timed pass got
+    through, for the other operations. Deletes are measured on a fresh trie
+    holding just the sampled prefixes.
+
+    The prefixes of a dataset rarely cover one another, so get_parent and
+    get_children run with the supernets 8 bits shorter than the prefixes
+    inserted as well: get_parent looks up the prefixes and get_children the
+    supernets, so both have results to format.
+
+    Args:
+        dataset (str): The name of the dataset, a key of DATASETS.
+        size (int): The number of prefixes.
+        lookups (int): The number of lookups in the skewed workload.
+        budget (float): The time budget of each lookup and delete benchmark, in seconds.
+        memory (bool): Whether to measure peak memory.
+        memory_sample (int): The number of items peak memory is measured over for lookups and deletes.
+        seed (int): The seed of the dataset and workload.
+
+    Returns:
+        list: A result dict per operation.
+    """
+    generate, ipv6 = DATASETS[dataset]
+    trie_cls = IPv6SubnetTrie if ipv6 else IPv4SubnetTrie
+    prefixes = generate(size, seed)
+    workload = skewed_lookups(prefixes, lookups, seed)
+    results = []
+
+    def record(operation, fn, items):
+        ops, seconds = _timed(fn, items, budget)
+        peak = _peak_memory(fn, items[:min(ops, memory_sample)]) if memory else None
+        results.append(_result(dataset, size, operation, ops, seconds, peak))
+
+    trie = trie_cls()
+    ops, seconds = _timed(trie.insert, prefixes)
+    peak = _peak_memory(trie_cls().insert, prefixes) if memory else None
+    results.append(_result(dataset, size, 'insert', ops, seconds, peak))
+
+    record('search', trie.search, workload)
+
+    covering = covering_prefixes(prefixes)
+    for prefix in covering:
+        trie.insert(prefix)
+    record('get_parent', trie.get_parent, workload)
+    record('get_children', trie.get_children, skewed_lookups(covering, lookups, seed))
+    trie.delete_many(set(covering) - set(prefixes))
+
+    for name, serializer in [('json', IPSubnetJsonSerializer()), ('protobuf', IPSubnetProtobufSerializer())]:
+        trie.serializer = serializer
+        serialized = trie.serialize()
+        for operation, fn, item in [('serialize', lambda _: trie.serialize(), None),
+                                    ('deserialize', serializer.deserialize, serialized)]:
+            _, seconds = _timed(fn, [item])
+            peak = _peak_memory(fn, [item]) if memory else None
+            # Reported per prefix so that sizes can be compared
+            results.append(_result(dataset, size, f'{name}_{operation}', size, seconds, peak))
+        del serialized
+
+    trie.serializer = None
+    pickled = pickle.dumps(trie)
+    for operation, fn, item in [('pickle_dumps', lambda _: pickle.dumps(trie), None),
+                                ('pickle_loads', pickle.loads, pickled)]:
+        _, seconds = _timed(fn, [item])
+        peak = _peak_memory(fn, [item]) if memory else None
+        results.append(_result(dataset, size, operation, size, seconds, peak))
+    del pickled
+
+    ops, seconds = _timed(trie.delete, prefixes, budget)
+    peak = None
+    if memory:
+        sample = prefixes[:min(ops, memory_sample)]
+        sample_trie = trie_cls()
+        for prefix in sample:
+            sample_trie.insert(prefix)
+        peak = _peak_memory(sample_trie.delete, sample)
+    results.append(_result(dataset, size, 'delete', ops, seconds, peak))
+    return results
+
+
+def run_imports(repeat: int = 20) -> list[dict]:
+    """
+    Benchmarks the time taken to import the package in a fresh interpreter.
+
+    Args:
+        repeat (int): The number of interpreters started per import, the median is kept.
+
+    Returns:
+        list: A result dict per import statement.
+    """
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(ip_subnet_trie.__file__)))
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [root, env.get('PYTHONPATH')]))
+
+    results = []
+    for operation, statement in IMPORTS.items():
+        script = f'import time; start = time.perf_counter(); {statement}; print(time.perf_counter() - start)'
+        seconds = statistics.median(
+            float(subprocess.run([sys.executable, '-c', script], env=env, check=True,
+                                 capture_output=True, text=True).stdout)
+            for _ in range(repeat)
+        )
+        results.append(_result('import', 0, operation, 1, seconds, None))
+    return results
+
+
+def run(datasets: list[str], sizes: list[int], progress=None, imports: bool = True, **options) -> dict:
+    """
+    Benchmarks every operation on every dataset at every size.
+
+    Args:
+        datasets (list): The names of the datasets.
+        sizes (list): The numbers of prefixes.
+        progress (callable): Called with every result as soon as it is measured.
+        imports (bool): Whether to benchmark the import time of the package too.
+        **options: Passed on to run_dataset.
+
+    Returns:
+        dict: The environment the benchmarks ran in and the results.
+    """
+    results = []
+    for result in run_imports() if imports else []:
+        if progress:
+            progress(result)
+        results.append(result)
+    for dataset in datasets:
+        for size in sizes:
+            for result in run_dataset(dataset, size, **options):
+                if progress:
+                    progress(result)
+                results.append(result)
+    return {
+        'environment': {
+            'python': sys.version.split()[0],
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'options': options,
+        },
+        'results': results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.10) -> list[dict]:
+    """
+    Compares benchmark results with a baseline.
+
+    Args:
+        baseline (dict): The baseline results, as returned by run().
+        current (dict): The results to check, as returned by run().
+        threshold (float): The relative slowdown or memory growth flagged as a regression.
+
+    Returns:
+        list: A dict per benchmark present in both, with the relative change of
+              ns/op and peak memory and whether it is a regression.
+    """
+    def key(result):
+        return result['dataset'], result['size'], result['operation']
+
+    baseline_results = {key(result): result for result in baseline['results']}
+    comparisons = []
+    for result in current['results']:
+        base = baseline_results.get(key(result))
+        if base is None:
+            continue
+        time_change = result['ns_per_op'] / base['ns_per_op'] - 1 if base['ns_per_op'] else 0.0
+        memory_change = None
+        if result['peak_bytes'] is not None and base['peak_bytes']:
+            memory_change = result['peak_bytes'] / base['peak_bytes'] - 1
+        comparisons.append({
+            'dataset': result['dataset'],
+            'size': result['size'],
+            'operation': result['operation'],
+            'time_change': time_change,
+            'memory_change': memory_change,
+            'regression': time_change > threshold or (memory_change is not None and memory_change > threshold),
+        })
+    return comparisons
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def save(results: dict, path: str):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
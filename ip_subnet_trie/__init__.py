@@ -1,2 +1,29 @@
 from .trie_ip_subnet import IPv4SubnetTrie, IPv6SubnetTrie
-from .trie_serializers import IPSubnetJsonSerializer, IPSubnetProtobufSerializer
+
+# Everything else is imported on first access, so that importing the tries
+# does not load protobuf, multiprocessing, asyncio, or the journal and the
+# instrumentation along with logging and threading.
+_LAZY_EXPORTS = {
+    'IPSubnetJsonSerializer': 'trie_serializers',
+    'IPSubnetProtobufSerializer': 'trie_serializers',
+    'SharedIPSubnetTrieView': 'shared_trie',
+    'SharedIPSubnetTriePublisher': 'shared_trie',
+    'SharedIPSubnetTrieReader': 'shared_trie',
+    'TrieJournal': 'journal',
+    'TrieInstrumentation': 'instrumentation',
+}
+
+__all__ = ['IPv4SubnetTrie', 'IPv6SubnetTrie', *_LAZY_EXPORTS]
+
+
+def __getattr__(name):
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    from importlib import import_module
+    value = getattr(import_module(f'.{_LAZY_EXPORTS[name]}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_EXPORTS))
@@ -0,0 +1,113 @@
+import argparse
+import sys
+
+from .classify import CHUNK_SIZE, classify, open_inputs
+from .snapshot import write_snapshot
+from .trie_ip_subnet import IPv4SubnetTrie, IPv6SubnetTrie
+
+
+def _add_address_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--unix', help='Path of the Unix socket, instead of TCP')
+    parser.add_argument('--host', default='127.0.0.1', help='Host for TCP (default: %(default)s)')
+    parser.add_argument('--port', type=int, default=7878, help='Port for TCP (default: %(default)s)')
+
+
+def _serve(args) -> int:
+    # The server modules are only needed by this command, keep them out of the startup of the others
+    import asyncio
+    import signal
+
+    from .server import TrieServer
+    from .snapshot import load_snapshot
+
+    server = TrieServer(load_snapshot(args.snapshot, args.ipv6), args.snapshot, args.ipv6)
+
+    async def serve():
+        address = await server.start(args.unix, args.host, args.port)
+        loop = asyncio.get_running_loop()
+        # SIGHUP reloads the snapshot without dropping connections
+        loop.add_signal_handler(signal.SIGHUP, lambda: asyncio.ensure_future(server.reload()))
+        print(f'Serving {args.snapshot} on {address}', file=sys.stderr)
+        await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def _loadgen(args) -> int:
+    import asyncio
+
+    from .server import random_addresses, run_load
+
+    queries = random_addresses(args.queries, args.ipv6, args.seed)
+    result = asyncio.run(run_load(queries, args.requests, args.concurrency, args.unix, args.host, args.port))
+    print(f"requests:   {result['requests']}")
+    print(f"throughput: {result['throughput']:.0f} req/s")
+    print(f"p50:        {result['p50_us']:.1f} us")
+    print(f"p99:        {result['p99_us']:.1f} us")
+    return 0
+
+
+def _classify(args) -> int:
+    try:
+        classify(args.snapshot, open_inputs(args.inputs), sys.stdout.buffer, args.ipv6, args.workers,
+                 args.chunk_size)
+    except BrokenPipeError:
+        pass
+    sys.stdout.flush()
+    return 0
+
+
+def _build(args) -> int:
+    trie = (IPv6SubnetTrie if args.ipv6 else IPv4SubnetTrie)()
+    for f in open_inputs([args.prefixes]):
+        for line in f:
+            line = line.split(b'#', 1)[0].strip()
+            if line:
+                trie.insert(line.decode('ascii'))
+    write_snapshot(trie, args.output)
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m ip_subnet_trie')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help='Serve lookups from a snapshot over a socket')
+    serve.add_argument('--snapshot', required=True, help='Protobuf or JSON (.json) snapshot of the trie')
+    serve.add_argument('--ipv6', action='store_true', help='The snapshot holds IPv6 subnets')
+    _add_address_arguments(serve)
+    serve.set_defaults(func=_serve)
+
+    loadgen = commands.add_parser('loadgen', help='Measure the latency and throughput of a running server')
+    loadgen.add_argument('--requests', type=int, default=100000, help='Total requests (default: %(default)s)')
+    loadgen.add_argument('--concurrency', type=int, default=32, help='Connections (default: %(default)s)')
+    loadgen.add_argument('--queries', type=int, default=10000, help='Distinct random addresses (default: %(default)s)')
+    loadgen.add_argument('--seed', type=int, default=0, help='Seed for the random addresses (default: %(default)s)')
+    loadgen.add_argument('--ipv6', action='store_true', help='Query IPv6 addresses')
+    _add_address_arguments(loadgen)
+    loadgen.set_defaults(func=_loadgen)
+
+    classify = commands.add_parser('classify', help='Tag streams of addresses with their covering subnet')
+    classify.add_argument('inputs', nargs='*', help="Files of addresses, one per line (default: '-' for stdin)")
+    classify.add_argument('--snapshot', required=True, help='Protobuf or JSON (.json) snapshot of the trie')
+    classify.add_argument('--ipv6', action='store_true', help='The snapshot holds IPv6 subnets')
+    classify.add_argument('--workers', type=int, default=0, help='Worker processes (default: classify in-process)')
+    classify.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Bytes read at a time (default: %(default)s)')
+    classify.set_defaults(func=_classify)
+
+    build = commands.add_parser('build', help='Build a snapshot from a file of prefixes')
+    build.add_argument('prefixes', help="File of prefixes, one per line, '#' starts a comment ('-' for stdin)")
+    build.add_argument('-o', '--output', required=True, help='Snapshot to write, JSON if it ends in .json, protobuf otherwise')
+    build.add_argument('--ipv6', action='store_true', help='The prefixes are IPv6 subnets')
+    build.set_defaults(func=_build)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
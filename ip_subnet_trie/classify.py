@@ -0,0 +1,129 @@
+import multiprocessing
+import sys
+from collections import deque
+
+from .snapshot import load_snapshot
+
+CHUNK_SIZE = 1 << 20
+
+_worker_trie = None  # The trie of a process pool worker, loaded once by _init_worker
+
+
+def read_chunks(files, chunk_size: int = CHUNK_SIZE):
+    """
+    Reads binary files in large chunks that end on a line boundary.
+
+    Args:
+        files (iterable): Binary file objects to read from, in order.
+        chunk_size (int): The number of bytes read at a time.
+
+    Yields:
+        bytes: The chunks, each holding whole lines only.
+    """
+    for f in files:
+        rest = b''
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            end = data.rfind(b'\n')
+            if end < 0:
+                rest += data
+                continue
+            yield rest + data[:end + 1]
+            rest = data[end + 1:]
+        if rest:
+            yield rest + b'\n'
+
+
+def classify_chunk(trie, chunk: bytes) -> bytes:
+    """
+    Tags every address in a chunk with the most specific subnet covering it.
+
+    Addresses without a covering subnet and lines that are not valid
+    addresses are left out of the output.
+
+    Args:
+        trie (BaseIPSubnetTrie): The trie to look the addresses up in.
+        chunk (bytes): Addresses, one per line.
+
+    Returns:
+        bytes: Lines of the address and its subnet separated by a tab.
+    """
+    addresses = [line for line in chunk.decode('ascii', 'replace').split() if line]
+    try:
+        matches = trie.longest_match_many(addresses)
+    except ValueError:
+        matches = []
+        for address in addresses:
+            try:
+                matches.append(trie.longest_match(address))
+            except ValueError:
+                matches.append(None)
+    return ''.join(
+        f'{address}\t{match}\n' for address, match in zip(addresses, matches) if match is not None
+    ).encode('ascii')
+
+
+def _init_worker(snapshot: str, ipv6: bool):
+    global _worker_trie
+    _worker_trie = load_snapshot(snapshot, ipv6)
+
+
+def _classify_in_worker(chunk: bytes) -> bytes:
+    return classify_chunk(_worker_trie, chunk)
+
+
+def classify(snapshot: str, inputs, output, ipv6: bool = False, workers: int = 0,
+             chunk_size: int = CHUNK_SIZE):
+    """
+    Classifies streams of addresses against a snapshot.
+
+    Chunks are read, looked up and written out one at a time, or fanned out
+    to a process pool when `workers` is set. At most two chunks per worker
+    are in flight, so memory use does not grow with the input.
+
+    Args:
+        snapshot (str): The snapshot file of the trie.
+        inputs (iterable): Binary file objects to read addresses from.
+        output: The binary file object the matches are written to.
+        ipv6 (bool): Whether the snapshot holds IPv6 subnets.
+        workers (int): The number of worker processes, 0 to classify in this process.
+        chunk_size (int): The number of bytes read at a time.
+
+    Returns:
+        None
+    """
+    chunks = read_chunks(inputs, chunk_size)
+    if not workers:
+        trie = load_snapshot(snapshot, ipv6)
+        for chunk in chunks:
+            output.write(classify_chunk(trie, chunk))
+        return
+
+    with multiprocessing.Pool(workers, _init_worker, (snapshot, ipv6)) as pool:
+        in_flight = deque()
+        for chunk in chunks:
+            in_flight.append(pool.apply_async(_classify_in_worker, (chunk,)))
+            if len(in_flight) >= 2 * workers:
+                output.write(in_flight.popleft().get())
+        while in_flight:
+            output.write(in_flight.popleft().get())
+
+
+def open_inputs(paths):
+    """
+    Opens the input files for classify(), '-' or no path at all meaning stdin.
+
+    Args:
+        paths (list): The paths of the input files.
+
+    Yields:
+        The binary file objects, each closed once the next one is requested.
+    """
+    for path in paths or ['-']:
+        if path == '-':
+            yield sys.stdin.buffer
+        else:
+            with open(path, 'rb') as f:
+                yield f
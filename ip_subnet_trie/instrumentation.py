@@ -0,0 +1,150 @@
+import functools
+import time
+from bisect import bisect_left
+
+# Upper bounds of the latency histogram buckets, in nanoseconds
+LATENCY_BUCKETS_NS = (
+    1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000,
+    500000, 1000000, 2500000, 10000000, 100000000,
+)
+
+
+class _OperationStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.hops = 0
+        self.max_hops = 0
+        self.total_ns = 0
+        self.latencies = [0] * (len(LATENCY_BUCKETS_NS) + 1)
+
+    def to_dict(self) -> dict:
+        histogram = {str(bound): count for bound, count in zip(LATENCY_BUCKETS_NS, self.latencies)}
+        histogram['+Inf'] = self.latencies[-1]
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'hops': self.hops,
+            'mean_hops': self.hops / self.count if self.count else 0.0,
+            'max_hops': self.max_hops,
+            'total_ns': self.total_ns,
+            'mean_ns': self.total_ns / self.count if self.count else 0.0,
+            'latency_histogram_ns': histogram,
+        }
+
+
+class TrieInstrumentation:
+    """
+    Records per-operation counts, node hops and latency histograms of a trie.
+
+    Attach an instance to a trie to turn recording on. The operations of the
+    trie are only wrapped while an instance is attached, so a trie without
+    instrumentation runs them as they are. Node hops are the nodes walked
+    down the trie along the looked up paths. Operations called from within
+    another operation are counted as part of the outer one.
+
+    Methods:
+        record(operation, method, args, kwargs): Runs and records an operation.
+        add_hops(hops): Adds node hops to the operation being recorded.
+        to_dict(): Exports the recorded data.
+        reset(): Clears the recorded data.
+    """
+
+    def __init__(self):
+        self._operations = {}
+        self._hops = 0
+        self._active = False
+
+    def add_hops(self, hops: int):
+        self._hops += hops
+
+    def record(self, operation: str, method, args, kwargs):
+        """
+        Runs an operation of the trie and records it.
+
+        Args:
+            operation (str): The name of the operation.
+            method (callable): The bound method implementing the operation.
+            args (tuple): The positional arguments of the operation.
+            kwargs (dict): The keyword arguments of the operation.
+
+        Returns:
+            The result of the operation.
+        """
+        if self._active:
+            return method(*args, **kwargs)
+
+        self._active = True
+        self._hops = 0
+        failed = True
+        start = time.perf_counter_ns()
+        try:
+            result = method(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            elapsed = time.perf_counter_ns() - start
+            self._active = False
+            stats = self._operations.get(operation)
+            if stats is None:
+                stats = self._operations[operation] = _OperationStats()
+            stats.count += 1
+            stats.errors += failed
+            stats.hops += self._hops
+            stats.max_hops = max(stats.max_hops, self._hops)
+            stats.total_ns += elapsed
+            stats.latencies[bisect_left(LATENCY_BUCKETS_NS, elapsed)] += 1
+
+    def to_dict(self) -> dict:
+        """
+        Exports the recorded data.
+
+        Returns:
+            dict: The count, errors, node hops and latency histogram of every
+                  operation, keyed by operation name.
+        """
+        return {operation: stats.to_dict() for operation, stats in self._operations.items()}
+
+    def reset(self):
+        self._operations = {}
+
+
+def _wrap_operation(instrumentation: TrieInstrumentation, operation: str, method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        return instrumentation.record(operation, method, args, kwargs)
+    return wrapper
+
+
+def _wrap_walk(instrumentation: TrieInstrumentation, method, hops):
+    @functools.wraps(method)
+    def wrapper(*args):
+        result = method(*args)
+        instrumentation.add_hops(hops(result))
+        return result
+    return wrapper
+
+
+def instrument(trie, instrumentation: TrieInstrumentation):
+    """
+    Makes the operations of a trie report to an instrumentation, or stop reporting.
+
+    The trie's class methods are left alone: the recording wrappers are bound
+    to the trie itself and shadow them, and are removed again when the
+    instrumentation is None.
+
+    Args:
+        trie (BaseIPSubnetTrie): The trie to be instrumented.
+        instrumentation (TrieInstrumentation): The instrumentation, or None to stop recording.
+
+    Returns:
+        None
+    """
+    for name in (*trie._instrumented_operations, *trie._instrumented_walks):
+        trie.__dict__.pop(name, None)
+    if instrumentation is None:
+        return
+    for name in trie._instrumented_operations:
+        setattr(trie, name, _wrap_operation(instrumentation, name, getattr(trie, name)))
+    for name, hops in trie._instrumented_walks.items():
+        setattr(trie, name, _wrap_walk(instrumentation, getattr(trie, name), hops))
@@ -0,0 +1,220 @@
+import logging
+import os
+import re
+import struct
+import threading
+
+from .operations import OPERATION_METHODS
+from .trie_serializers import IPSubnetProtobufSerializer
+
+# Every record is an operation code and the length of the IP subnet string
+# that follows it.
+_RECORD = struct.Struct('<BH')
+
+_logger = logging.getLogger(__name__)
+
+_SEGMENT_NAME = re.compile(r'^journal\.(\d+)\.log$')
+_SNAPSHOT_NAME = re.compile(r'^snapshot\.(\d+)\.pb$')
+
+
+def _read_records(path: str):
+    """
+    Reads the records of a journal segment, stopping at a torn tail.
+
+    Args:
+        path (str): The path of the journal segment.
+
+    Yields:
+        tuple: The operation code, the IP subnet and the offset after the record.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    offset = 0
+    while offset + _RECORD.size <= len(data):
+        op, length = _RECORD.unpack_from(data, offset)
+        end = offset + _RECORD.size + length
+        if op not in OPERATION_METHODS or end > len(data):
+            return
+        yield op, data[offset + _RECORD.size:end].decode('ascii'), end
+        offset = end
+
+
+class TrieJournal:
+    """
+    An append-only write-ahead journal of trie mutations.
+
+    The journal directory holds protobuf snapshots named `snapshot.<n>.pb`
+    and journal segments named `journal.<n>.log`. A snapshot numbered n
+    contains every change from the segments numbered up to n, so loading a
+    trie takes the newest snapshot and replays the segments after it.
+
+    Attributes:
+        directory: The directory holding the snapshots and journal segments.
+        fsync: Whether every record is fsynced to disk before returning.
+
+    Methods:
+        append(op, ip_subnet): Appends a mutation to the journal.
+        load(trie): Restores the trie from the latest snapshot and journal tail.
+        compact(trie): Folds the journal into a new snapshot in the background.
+        close(): Closes the active journal segment.
+    """
+
+    def __init__(self, directory: str, fsync: bool = False):
+        self.directory = directory
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        segments = self._list(_SEGMENT_NAME)
+        self._sequence = segments[-1] if segments else self._snapshot_sequence() + 1
+        path = self._segment_path(self._sequence)
+        if os.path.exists(path):
+            # Drop a record torn by a crash so that new records stay readable
+            end = 0
+            for _, _, end in _read_records(path):
+                pass
+            os.truncate(path, end)
+        self._file = open(path, 'ab')
+
+    def _list(self, pattern) -> list[int]:
+        sequences = []
+        for name in os.listdir(self.directory):
+            match = pattern.match(name)
+            if match:
+                sequences.append(int(match.group(1)))
+        return sorted(sequences)
+
+    def _segment_path(self, sequence: int) -> str:
+        return os.path.join(self.directory, f'journal.{sequence}.log')
+
+    def _snapshot_path(self, sequence: int) -> str:
+        return os.path.join(self.directory, f'snapshot.{sequence}.pb')
+
+    def _snapshot_sequence(self) -> int:
+        snapshots = self._list(_SNAPSHOT_NAME)
+        return snapshots[-1] if snapshots else 0
+
+    def append(self, op: int, ip_subnet: str):
+        """
+        Appends a mutation to the journal.
+
+        Args:
+            op (int): The operation code, INSERT, DELETE or DELETE_SUBTREE.
+            ip_subnet (str): The IP subnet the operation applies to.
+
+        Returns:
+            None
+        """
+        data = ip_subnet.encode('ascii')
+        record = _RECORD.pack(op, len(data)) + data
+        with self._lock:
+            self._file.write(record)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def _restore(self, trie, last_sequence: int = None):
+        """
+        Loads the latest snapshot into the trie and replays the journal segments after it.
+
+        Args:
+            trie (BaseIPSubnetTrie): The trie to restore into.
+            last_sequence (int): The last journal segment to replay, or None for all of them.
+
+        Returns:
+            None
+        """
+        snapshot_sequence = self._snapshot_sequence()
+        if snapshot_sequence:
+            with open(self._snapshot_path(snapshot_sequence), 'rb') as f:
+                trie._root = IPSubnetProtobufSerializer().deserialize(f.read())
+
+        # Replayed changes are already journaled
+        journal, trie.journal = trie.journal, None
+        try:
+            for sequence in self._list(_SEGMENT_NAME):
+                if sequence <= snapshot_sequence:
+                    continue
+                if last_sequence is not None and sequence > last_sequence:
+                    break
+                for op, ip_subnet, _ in _read_records(self._segment_path(sequence)):
+                    try:
+                        getattr(trie, OPERATION_METHODS[op])(ip_subnet)
+                    except ValueError as e:
+                        # A bad record must not make the rest of the journal unloadable
+                        _logger.warning('Skipping journal record %s %r in segment %d: %s',
+                                        OPERATION_METHODS[op], ip_subnet, sequence, e)
+        finally:
+            trie.journal = journal
+
+    def load(self, trie):
+        """
+        Restores the trie from the latest snapshot and replays the journal tail.
+
+        Records holding an invalid IP subnet are logged and skipped.
+
+        Args:
+            trie (BaseIPSubnetTrie): The trie to restore into.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._restore(trie)
+
+    def compact(self, trie) -> threading.Thread:
+        """
+        Folds the journal into a new snapshot in the background.
+
+        The active journal segment is sealed and a new one is started, then a
+        background thread replays the sealed segments on top of the previous
+        snapshot, writes the new snapshot and removes the files it replaces.
+        The live trie is never read by the background thread.
+
+        Args:
+            trie (BaseIPSubnetTrie): The trie the journal belongs to.
+
+        Returns:
+            threading.Thread: The thread doing the compaction.
+        """
+        with self._lock:
+            sealed = self._sequence
+            self._file.close()
+            self._sequence += 1
+            self._file = open(self._segment_path(self._sequence), 'ab')
+
+        thread = threading.Thread(target=self._fold, args=(type(trie), sealed), daemon=True)
+        thread.start()
+        return thread
+
+    def _fold(self, trie_cls, sealed: int):
+        with self._compact_lock:
+            if self._snapshot_sequence() >= sealed:
+                return
+            scratch = trie_cls()
+            self._restore(scratch, sealed)
+
+            path = self._snapshot_path(sealed)
+            with open(path + '.tmp', 'wb') as f:
+                f.write(IPSubnetProtobufSerializer().serialize(scratch))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path + '.tmp', path)
+
+            for sequence in self._list(_SNAPSHOT_NAME):
+                if sequence < sealed:
+                    os.remove(self._snapshot_path(sequence))
+            for sequence in self._list(_SEGMENT_NAME):
+                if sequence <= sealed:
+                    os.remove(self._segment_path(sequence))
+
+    def close(self):
+        """
+        Closes the active journal segment.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._file.close()
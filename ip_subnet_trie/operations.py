@@ -0,0 +1,8 @@
+# Codes of the trie mutations recorded in a journal. They live apart from
+# the journal so that the tries can refer to them without importing it.
+INSERT = 1
+DELETE = 2
+DELETE_SUBTREE = 3
+
+# The trie method replaying each mutation
+OPERATION_METHODS = {INSERT: 'insert', DELETE: 'delete', DELETE_SUBTREE: 'delete_subtree'}
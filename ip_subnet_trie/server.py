@@ -0,0 +1,339 @@
+import asyncio
+import ipaddress
+import random
+import struct
+import time
+
+from .snapshot import load_snapshot
+
+# Every frame is a big-endian length followed by the body. A request body is
+# an operation code, a request id and the IP subnet queried; a response body
+# is the request id, a status and the result.
+_LENGTH = struct.Struct('>I')
+_REQUEST = struct.Struct('>BI')
+_RESPONSE = struct.Struct('>IB')
+_MAX_REQUEST_SIZE = 1024
+_HIGH_WATER = 1 << 20  # Bytes buffered for a connection before reading from it pauses
+
+LONGEST_MATCH = 1
+SEARCH = 2
+CHILDREN = 3
+
+OK = 0
+NOT_FOUND = 1
+ERROR = 2
+
+
+def _answer(trie, op: int, query: str) -> tuple:
+    """
+    Answers a single query against the trie.
+
+    Args:
+        trie (BaseIPSubnetTrie): The trie to query.
+        op (int): The operation code, LONGEST_MATCH, SEARCH or CHILDREN.
+        query (str): The IP subnet queried.
+
+    Returns:
+        tuple: The status and the encoded result.
+    """
+    try:
+        if op == LONGEST_MATCH:
+            result = trie.longest_match(query)
+        elif op == SEARCH:
+            result = trie.search(query) or None
+        elif op == CHILDREN:
+            result = '\n'.join(trie.get_children(query))
+        else:
+            return ERROR, b'Unknown operation'
+    except Exception as e:  # A bad query must not take the server down
+        return ERROR, str(e).encode()
+    return (NOT_FOUND, b'') if result is None else (OK, result.encode())
+
+
+class TrieServer:
+    """
+    An asyncio server answering lookups against a trie over a Unix socket or TCP.
+
+    Lookups that arrive in the same event loop iteration, from any number of
+    connections, are answered together in one pass: longest matches go
+    through the trie's longest_match_many().
+
+    Attributes:
+        trie: The trie queries are answered from.
+        snapshot: The snapshot file the trie is reloaded from.
+        ipv6: Whether the snapshot holds IPv6 subnets.
+
+    Methods:
+        start(unix_path, host, port): Starts listening.
+        reload(snapshot): Swaps in a trie loaded from a snapshot without dropping connections.
+        serve_forever(): Serves until cancelled.
+        close(): Stops listening.
+    """
+
+    def __init__(self, trie, snapshot: str = None, ipv6: bool = False):
+        self.trie = trie
+        self.snapshot = snapshot
+        self.ipv6 = ipv6
+        self.batches = 0
+        self._server = None
+        self._pending = []
+        self._scheduled = False
+
+    async def start(self, unix_path: str = None, host: str = '127.0.0.1', port: int = 0):
+        """
+        Starts listening on a Unix socket, or on a TCP port if no socket path is given.
+
+        Args:
+            unix_path (str): The path of the Unix socket.
+            host (str): The host to listen on over TCP.
+            port (int): The port to listen on over TCP, 0 to pick a free one.
+
+        Returns:
+            The address the server listens on.
+        """
+        if unix_path:
+            self._server = await asyncio.start_unix_server(self._handle, path=unix_path)
+        else:
+            self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    def close(self):
+        self._server.close()
+
+    async def wait_closed(self):
+        await self._server.wait_closed()
+
+    async def reload(self, snapshot: str = None):
+        """
+        Loads a trie from a snapshot in a worker thread and swaps it in.
+
+        Lookups keep being answered from the current trie while the snapshot
+        loads; open connections are not affected.
+
+        Args:
+            snapshot (str): The snapshot file, defaults to the one the server was started with.
+
+        Returns:
+            None
+        """
+        snapshot = snapshot or self.snapshot
+        loop = asyncio.get_running_loop()
+        self.trie = await loop.run_in_executor(None, load_snapshot, snapshot, self.ipv6)
+        self.snapshot = snapshot
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                (length,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+                if not _REQUEST.size <= length <= _MAX_REQUEST_SIZE:
+                    break
+                body = await reader.readexactly(length)
+                op, request_id = _REQUEST.unpack_from(body)
+                query = body[_REQUEST.size:].decode('ascii', 'replace')
+
+                self._pending.append((op, query, request_id, writer))
+                if not self._scheduled:
+                    self._scheduled = True
+                    loop.call_soon(self._flush)
+                if writer.transport.get_write_buffer_size() > _HIGH_WATER:
+                    await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def _flush(self):
+        """
+        Answers every pending lookup in one pass and writes the responses.
+
+        Returns:
+            None
+        """
+        pending, self._pending = self._pending, []
+        self._scheduled = False
+        self.batches += 1
+        trie = self.trie
+
+        answers = [None] * len(pending)
+        matches = [i for i, (op, _, _, _) in enumerate(pending) if op == LONGEST_MATCH]
+        if matches:
+            try:
+                results = trie.longest_match_many([pending[i][1] for i in matches])
+            except Exception:
+                pass  # Answer them one by one below to isolate the bad query
+            else:
+                for i, result in zip(matches, results):
+                    answers[i] = (NOT_FOUND, b'') if result is None else (OK, result.encode())
+
+        for i, (op, query, request_id, writer) in enumerate(pending):
+            status, payload = answers[i] or _answer(trie, op, query)
+            if not writer.transport.is_closing():
+                writer.write(_LENGTH.pack(_RESPONSE.size + len(payload))
+                             + _RESPONSE.pack(request_id, status) + payload)
+
+
+class TrieClient:
+    """
+    A client for TrieServer that can have many requests in flight on one connection.
+
+    Methods:
+        connect(unix_path, host, port): Opens a connection to a server.
+        longest_match(ip_subnet): Returns the longest match of an IP subnet.
+        search(ip_subnet): Searches for an IP subnet.
+        get_children(ip_subnet): Returns the children of an IP subnet.
+        close(): Closes the connection.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+        self._next_id = 0
+        self._waiting = {}
+        self._reading = asyncio.ensure_future(self._read_responses())
+
+    @classmethod
+    async def connect(cls, unix_path: str = None, host: str = '127.0.0.1', port: int = None) -> 'TrieClient':
+        if unix_path:
+            reader, writer = await asyncio.open_unix_connection(unix_path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def _read_responses(self):
+        try:
+            while True:
+                (length,) = _LENGTH.unpack(await self._reader.readexactly(_LENGTH.size))
+                body = await self._reader.readexactly(length)
+                request_id, status = _RESPONSE.unpack_from(body)
+                future = self._waiting.pop(request_id, None)
+                if future is not None and not future.done():
+                    future.set_result((status, body[_RESPONSE.size:].decode()))
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            for future in self._waiting.values():
+                if not future.done():
+                    future.set_exception(ConnectionError(str(e)))
+            self._waiting.clear()
+
+    async def request(self, op: int, query: str) -> tuple:
+        """
+        Sends a request and waits for its response.
+
+        Args:
+            op (int): The operation code, LONGEST_MATCH, SEARCH or CHILDREN.
+            query (str): The IP subnet queried.
+
+        Returns:
+            tuple: The status and the decoded result.
+
+        Raises:
+            ConnectionError: If the connection to the server is lost.
+            ValueError: If the server could not answer the query.
+        """
+        if self._reading.done():
+            # Nothing would ever resolve the response
+            raise ConnectionError('Connection to the server is closed')
+        request_id = self._next_id
+        self._next_id = (self._next_id + 1) & 0xFFFFFFFF
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[request_id] = future
+        data = query.encode('ascii')
+        self._writer.write(_LENGTH.pack(_REQUEST.size + len(data)) + _REQUEST.pack(op, request_id) + data)
+        status, result = await future
+        if status == ERROR:
+            raise ValueError(result)
+        return status, result
+
+    async def longest_match(self, ip_subnet: str):
+        status, result = await self.request(LONGEST_MATCH, ip_subnet)
+        return result if status == OK else None
+
+    async def search(self, ip_subnet: str):
+        status, result = await self.request(SEARCH, ip_subnet)
+        return result if status == OK else False
+
+    async def get_children(self, ip_subnet: str) -> list:
+        _, result = await self.request(CHILDREN, ip_subnet)
+        return result.split('\n') if result else []
+
+    async def close(self):
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except ConnectionError:
+            pass
+        await self._reading
+
+
+def random_addresses(count: int, ipv6: bool = False, seed: int = 0) -> list[str]:
+    """
+    Generates random IP addresses for load testing.
+
+    Args:
+        count (int): The number of addresses.
+        ipv6 (bool): Whether to generate IPv6 addresses.
+        seed (int): The seed of the random generator.
+
+    Returns:
+        list: The generated addresses.
+    """
+    rng = random.Random(seed)
+    if ipv6:
+        return [str(ipaddress.IPv6Address(rng.getrandbits(128))) for _ in range(count)]
+    return [str(ipaddress.IPv4Address(rng.getrandbits(32))) for _ in range(count)]
+
+
+async def run_load(queries: list[str], requests: int, concurrency: int,
+                   unix_path: str = None, host: str = '127.0.0.1', port: int = None) -> dict:
+    """
+    Sends longest match lookups to a server and measures their latency.
+
+    Every one of the `concurrency` connections keeps one request in flight
+    at a time.
+
+    Args:
+        queries (list): The IP addresses to look up, cycled through.
+        requests (int): The total number of requests.
+        concurrency (int): The number of connections.
+        unix_path (str): The path of the server's Unix socket.
+        host (str): The server's host over TCP.
+        port (int): The server's port over TCP.
+
+    Returns:
+        dict: The number of requests, the elapsed seconds, the throughput in
+              requests per second and the p50 and p99 latencies in microseconds.
+    """
+    clients = [await TrieClient.connect(unix_path, host, port) for _ in range(concurrency)]
+    latencies = []
+
+    async def worker(client: TrieClient, offset: int, count: int):
+        for i in range(count):
+            query = queries[(offset + i) % len(queries)]
+            start = time.perf_counter_ns()
+            await client.request(LONGEST_MATCH, query)
+            latencies.append(time.perf_counter_ns() - start)
+
+    share, extra = divmod(requests, concurrency)
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        worker(client, i * share, share + (i < extra)) for i, client in enumerate(clients)
+    ))
+    elapsed = time.perf_counter() - start
+    for client in clients:
+        await client.close()
+
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] / 1000 if latencies else 0.0
+
+    return {
+        'requests': len(latencies),
+        'seconds': elapsed,
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_us': percentile(0.50),
+        'p99_us': percentile(0.99),
+    }
@@ -0,0 +1,453 @@
+import struct
+import threading
+from array import array
+from collections import deque
+from multiprocessing import resource_tracker, shared_memory
+
+from .trie_ip_subnet import BaseIPSubnetTrie, IPv4SubnetTrie, IPv6SubnetTrie
+
+# Flat layout: a fixed header, then 2 * node_count int32 child indexes
+# (0 means "no child", the root can never be a child), then node_count
+# uint8 is_end flags. Nodes are numbered in breadth-first order.
+_HEADER = struct.Struct('<4sBBxxII')
+_MAGIC = b'IPST'
+_LAYOUT_VERSION = 1
+_CONTROL = struct.Struct('<Q')  # Current generation published under a name
+
+_TRIE_CLASSES = {
+    IPv4SubnetTrie._address_bits: IPv4SubnetTrie,
+    IPv6SubnetTrie._address_bits: IPv6SubnetTrie,
+}
+
+
+def _flatten_trie(trie: BaseIPSubnetTrie) -> bytes:
+    """
+    Encodes a trie into the flat node-array layout.
+
+    Args:
+        trie (BaseIPSubnetTrie): The trie to be encoded.
+
+    Returns:
+        bytes: The encoded trie.
+    """
+    children = array('i')
+    is_end = bytearray()
+    queue = deque([trie._get_root()])
+    next_index = 1
+    while queue:
+        node = queue.popleft()
+        is_end.append(node.is_end)
+        for child in node.children:
+            if child is None:
+                children.append(0)
+            else:
+                children.append(next_index)
+                queue.append(child)
+                next_index += 1
+
+    if children.itemsize != 4:
+        raise RuntimeError('Platform int is not 32 bits wide')
+    header = _HEADER.pack(_MAGIC, _LAYOUT_VERSION, trie._address_bits, len(is_end), 0)
+    return header + children.tobytes() + bytes(is_end)
+
+
+def _create_shared_memory(name: str, size: int) -> shared_memory.SharedMemory:
+    shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+    # The publisher unlinks its blocks explicitly; keep the resource tracker
+    # from unlinking them behind the back of other processes.
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+class SharedIPSubnetTrieView:
+    """
+    A read-only view of a trie stored in the flat node-array layout.
+
+    The view reads nodes straight out of the underlying buffer, which is
+    usually a shared memory block, so lookups never copy or unpickle it.
+
+    Methods:
+        attach(name): Attaches a view to a shared memory block.
+        search(ip_subnet): Searches for an IP subnet in the trie.
+        get_children(ip_subnet): Returns the children of an IP subnet in the trie.
+        get_parent(ip_subnet): Returns the parent of an IP subnet in the trie.
+        longest_match(ip_subnet): Returns the most specific IP subnet covering an IP subnet.
+        close(): Releases the underlying buffer.
+    """
+
+    def __init__(self, buffer, shm: shared_memory.SharedMemory = None):
+        self._shm = shm
+        self._buffer = memoryview(buffer)
+        if len(self._buffer) < _HEADER.size:
+            self._buffer.release()
+            raise ValueError('Invalid shared trie layout')
+        magic, version, address_bits, node_count, _ = _HEADER.unpack_from(self._buffer)
+        if magic != _MAGIC or version != _LAYOUT_VERSION:
+            self._buffer.release()
+            raise ValueError('Invalid shared trie layout')
+        if address_bits not in _TRIE_CLASSES:
+            self._buffer.release()
+            raise ValueError('Invalid shared trie address width')
+        if len(self._buffer) < _HEADER.size + 9 * node_count:
+            self._buffer.release()
+            raise ValueError('Truncated shared trie')
+
+        children_end = _HEADER.size + 8 * node_count
+        self._children = self._buffer[_HEADER.size:children_end].cast('i')
+        self._is_end = self._buffer[children_end:children_end + node_count]
+        self.node_count = node_count
+        # Parsing and formatting are borrowed from the matching in-memory trie.
+        self._helper = _TRIE_CLASSES[address_bits]()
+
+    @classmethod
+    def attach(cls, name: str) -> 'SharedIPSubnetTrieView':
+        """
+        Attaches a read-only view to the shared memory block with the given name.
+
+        Args:
+            name (str): The name of the shared memory block.
+
+        Returns:
+            SharedIPSubnetTrieView: The attached view.
+        """
+        shm = _attach_shared_memory(name)
+        try:
+            return cls(shm.buf, shm)
+        except ValueError:
+            shm.close()
+            raise
+
+    def close(self):
+        """
+        Releases the underlying buffer and detaches from the shared memory block, if any.
+
+        Returns:
+            None
+        """
+        if self._buffer is None:
+            return
+        self._children.release()
+        self._is_end.release()
+        self._buffer.release()
+        self._children = self._is_end = self._buffer = None
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _traverse_node(self, ip_subnet: str):
+        """
+        Traverses the flat trie to find the node corresponding to the given IP subnet.
+
+        Args:
+            ip_subnet (str): The IP subnet to look for.
+
+        Returns:
+            tuple: The indexes of the nodes on the way, the bits of the path taken
+                   and the index of the node found, or None if it is not in the trie.
+        """
+        ip_parts, netmask = self._helper._parse_ip_subnet(ip_subnet)
+        children = self._children
+        parents = []
+        path = []
+        index = 0
+        for bit in self._helper._bit_iterator(ip_parts):
+            if len(path) >= netmask:
+                break
+            child = children[2 * index + bit]
+            if not child:
+                return parents, path, None
+            parents.append(index)
+            path.append(bit)
+            index = child
+
+        if len(path) == netmask and self._is_end[index]:
+            return parents, path, index
+        return parents, path, None
+
+    def _format(self, path: list[int]) -> str:
+        return self._helper._format_ip_address(list(path), len(path))
+
+    def search(self, ip_subnet: str):
+        """
+        Searches for an IP subnet in the trie.
+
+        Args:
+            ip_subnet (str): The IP subnet to search for.
+
+        Returns:
+            str or False: The string representation of the found IP subnet if found, False otherwise.
+        """
+        _, path, index = self._traverse_node(ip_subnet)
+        return self._format(path) if index is not None else False
+
+    def get_children(self, ip_subnet: str):
+        """
+        Returns the children of an IP subnet in the trie.
+
+        Args:
+            ip_subnet (str): The IP subnet to get the children of.
+
+        Returns:
+            list: A list of string representations of the children.
+        """
+        _, path, index = self._traverse_node(ip_subnet)
+        if index is None:
+            return []
+
+        children = self._children
+        result = []
+        stack = [(children[2 * index + 1], path + [1]), (children[2 * index], path + [0])]
+        while stack:
+            index, path = stack.pop()
+            if not index:
+                continue
+            if self._is_end[index]:
+                result.append(self._format(path))
+            stack.append((children[2 * index + 1], path + [1]))
+            stack.append((children[2 * index], path + [0]))
+        return result
+
+    def longest_match(self, ip_subnet: str):
+        """
+        Returns the most specific IP subnet in the trie that covers the given IP subnet.
+
+        Args:
+            ip_subnet (str): The IP address or subnet to match.
+
+        Returns:
+            str: The representation of the longest matching IP subnet, or None if nothing matches.
+        """
+        ip_parts, netmask = self._helper._parse_ip_subnet(ip_subnet)
+        children = self._children
+        is_end = self._is_end
+        path = []
+        match = 0 if is_end[0] else None
+        index = 0
+        for bit in self._helper._bit_iterator(ip_parts):
+            if len(path) >= netmask:
+                break
+            index = children[2 * index + bit]
+            if not index:
+                break
+            path.append(bit)
+            if is_end[index]:
+                match = len(path)
+        return self._format(path[:match]) if match is not None else None
+
+    def get_parent(self, ip_subnet: str):
+        """
+        Retrieves the parent node of the given IP subnet.
+
+        Args:
+            ip_subnet (str): The IP subnet to find the parent for.
+
+        Returns:
+            str: The representation of the nearest parent node, or None if no parent found.
+        """
+        parents, path, index = self._traverse_node(ip_subnet)
+        if not parents or index is None:
+            return None
+        for depth in range(len(parents) - 1, -1, -1):
+            if self._is_end[parents[depth]]:
+                return self._format(path[:depth])
+        return None
+
+
+class SharedIPSubnetTriePublisher:
+    """
+    Publishes generations of a trie into shared memory under a common name.
+
+    Every call to publish() writes the trie into a new shared memory block and
+    then bumps the generation counter stored in the control block `name`.
+    Readers keep serving from the block they are attached to until they see
+    the new generation, so the last `keep` generations are left in place.
+
+    Only one publisher may use a name at a time. The blocks are not tied to
+    the publisher process, so if it dies without close() they stay behind; a
+    publisher started under the same name takes them over and carries on
+    from the generation stored in the control block, while readers keep
+    serving the last generation published.
+
+    Methods:
+        publish(trie): Publishes a new generation of the trie.
+        close(): Unlinks every shared memory block owned by the publisher.
+    """
+
+    def __init__(self, name: str, keep: int = 1):
+        self.name = name
+        self.keep = keep
+        self.generation = 0
+        self._generations = deque()
+        try:
+            self._control = _create_shared_memory(name, _CONTROL.size)
+        except FileExistsError:
+            self._resume()
+        else:
+            _CONTROL.pack_into(self._control.buf, 0, 0)
+
+    def _resume(self):
+        """
+        Takes over the control block and the generations left behind by a previous publisher.
+
+        Returns:
+            None
+        """
+        self._control = _attach_shared_memory(self.name)
+        if self._control.size < _CONTROL.size:
+            self._control.close()
+            raise ValueError(f'Shared memory block {self.name!r} is not a trie control block')
+        self.generation = _CONTROL.unpack_from(self._control.buf)[0]
+
+        generation = self.generation
+        while generation > 0:
+            try:
+                self._generations.appendleft(_attach_shared_memory(f'{self.name}_{generation}'))
+            except FileNotFoundError:
+                break
+            generation -= 1
+        self._rotate()
+
+    def _rotate(self):
+        # Processes still attached to an unlinked block keep their mapping.
+        while len(self._generations) > self.keep + 1:
+            old = self._generations.popleft()
+            old.close()
+            old.unlink()
+
+    def publish(self, trie: BaseIPSubnetTrie) -> int:
+        """
+        Publishes a new generation of the trie.
+
+        Args:
+            trie (BaseIPSubnetTrie): The trie to be published.
+
+        Returns:
+            int: The generation number of the published trie.
+        """
+        data = _flatten_trie(trie)
+        generation = self.generation + 1
+        block_name = f'{self.name}_{generation}'
+        try:
+            shm = _create_shared_memory(block_name, len(data))
+        except FileExistsError:
+            # Left behind by a publisher that died before publishing it, no reader is attached to it
+            stale = _attach_shared_memory(block_name)
+            stale.close()
+            stale.unlink()
+            shm = _create_shared_memory(block_name, len(data))
+        shm.buf[:len(data)] = data
+        self._generations.append(shm)
+        _CONTROL.pack_into(self._control.buf, 0, generation)
+        self.generation = generation
+        self._rotate()
+        return generation
+
+    def close(self):
+        """
+        Unlinks every shared memory block owned by the publisher.
+
+        Returns:
+            None
+        """
+        while self._generations:
+            shm = self._generations.popleft()
+            shm.close()
+            shm.unlink()
+        if self._control is not None:
+            self._control.close()
+            self._control.unlink()
+            self._control = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SharedIPSubnetTrieReader:
+    """
+    Follows the generations published by a SharedIPSubnetTriePublisher.
+
+    A reader may be shared between threads. A view it returned stays open
+    until the reader picks up the generation after the next one, so a lookup
+    in flight on the previous view is not cut short by a single switch-over.
+
+    Methods:
+        view(): Returns a view of the latest published generation.
+        close(): Detaches from the shared memory blocks.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.generation = 0
+        self._view = None
+        self._previous_view = None
+        self._lock = threading.Lock()
+        self._control = _attach_shared_memory(name)
+
+    def _published_generation(self) -> int:
+        return _CONTROL.unpack_from(self._control.buf)[0]
+
+    def view(self) -> SharedIPSubnetTrieView:
+        """
+        Returns a view of the latest published generation.
+
+        Callers should fetch the view again for every batch of lookups instead
+        of holding on to it: views two generations behind are closed.
+
+        Returns:
+            SharedIPSubnetTrieView: The view, or None if nothing was published yet.
+        """
+        if self._published_generation() == self.generation:
+            return self._view
+        with self._lock:
+            generation = self._published_generation()
+            while generation != self.generation:
+                try:
+                    view = SharedIPSubnetTrieView.attach(f'{self.name}_{generation}')
+                except FileNotFoundError:
+                    # Rotated out before we got to it, pick up the newer one
+                    generation = self._published_generation()
+                    continue
+                if self._previous_view is not None:
+                    self._previous_view.close()
+                self._previous_view, self._view = self._view, view
+                self.generation = generation
+            return self._view
+
+    def close(self):
+        """
+        Detaches from the shared memory blocks.
+
+        Returns:
+            None
+        """
+        for view in (self._previous_view, self._view):
+            if view is not None:
+                view.close()
+        self._view = self._previous_view = None
+        if self._control is not None:
+            self._control.close()
+            self._control = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,44 @@
+from .trie_ip_subnet import BaseIPSubnetTrie, IPv4SubnetTrie, IPv6SubnetTrie
+from .trie_serializers import IPSubnetJsonSerializer, IPSubnetProtobufSerializer
+
+
+def _serializer_for(path: str):
+    return IPSubnetJsonSerializer() if path.endswith('.json') else IPSubnetProtobufSerializer()
+
+
+def load_snapshot(path: str, ipv6: bool = False) -> BaseIPSubnetTrie:
+    """
+    Loads a trie from a snapshot file.
+
+    Snapshots ending in `.json` are read with the JSON serializer, any other
+    file is read with the protobuf serializer.
+
+    Args:
+        path (str): The path of the snapshot file.
+        ipv6 (bool): Whether the snapshot holds IPv6 subnets.
+
+    Returns:
+        BaseIPSubnetTrie: The loaded trie.
+    """
+    serializer = _serializer_for(path)
+    trie = (IPv6SubnetTrie if ipv6 else IPv4SubnetTrie)(serializer=serializer)
+    mode = 'r' if isinstance(serializer, IPSubnetJsonSerializer) else 'rb'
+    with open(path, mode) as f:
+        trie.deserialize(f.read())
+    return trie
+
+
+def write_snapshot(trie: BaseIPSubnetTrie, path: str):
+    """
+    Writes a trie to a snapshot file, choosing the serializer the same way as load_snapshot.
+
+    Args:
+        trie (BaseIPSubnetTrie): The trie to be written.
+        path (str): The path of the snapshot file.
+
+    Returns:
+        None
+    """
+    data = _serializer_for(path).serialize(trie)
+    with open(path, 'w' if isinstance(data, str) else 'wb') as f:
+        f.write(data)
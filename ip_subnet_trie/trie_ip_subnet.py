@@ -1,9 +1,18 @@
 import re
+import sys
 
 from .base import *
+from .operations import INSERT, DELETE, DELETE_SUBTREE
+from .trie_serializers import _pack_nodes, _unpack_nodes
 from .utils import parse_ip_subnet_v4, parse_ip_subnet_v6
     
 
+def _unpickle_trie(cls, data: bytes, serializer: TrieSerializer):
+    trie = cls(serializer=serializer)
+    trie._root = _unpack_nodes(data)
+    return trie
+
+
 class BaseIPSubnetTrie(IPSubnetTrie):
     """
     A specialized trie data structure for storing and manipulating IP subnets.
@@ -11,6 +20,8 @@ class BaseIPSubnetTrie(IPSubnetTrie):
     Attributes:
         serializer: An optional instance of a class that implements the TrieSerializer interface.
                     This serializer is used to serialize and deserialize the trie.
+        journal: An optional TrieJournal that every insert and delete is appended to.
+        instrumentation: An optional TrieInstrumentation that records every operation.
         __root: The root node of the trie.
 
     Methods:
@@ -18,18 +29,60 @@ class BaseIPSubnetTrie(IPSubnetTrie):
         search(ip_subnet): Searches for an IP subnet in the trie.
         get_children(ip_subnet): Returns the children of an IP subnet in the trie.
         get_parent(ip_subnet): Returns the parent of an IP subnet in the trie.
+        longest_match(ip_subnet): Returns the most specific IP subnet covering an IP subnet.
+        longest_match_many(ip_subnets): Returns the longest match of many IP subnets in a single pass.
         delete(ip_subnet): Deletes an IP subnet from the trie.
+        delete_subtree(ip_subnet): Deletes an IP subnet and everything under it from the trie.
+        delete_many(ip_subnets): Deletes many IP subnets from the trie in a single sweep.
         serialize(): Serializes the trie using the specified serializer.
         deserialize(s): Deserializes the trie using the specified serialized string.
+        compact(): Folds the journal into a new snapshot in the background.
+        stats(): Returns the size and shape of the trie.
     """
 
-    def __init__(self, serializer: TrieSerializer = None):
+    def __init__(self, serializer: TrieSerializer = None, journal=None, instrumentation=None):
         self._root = IPSubnetNode()
         self.serializer = serializer
+        self.journal = journal
+        self.instrumentation = instrumentation
+
+    # The public operations an attached TrieInstrumentation records
+    _instrumented_operations = (
+        'insert', 'search', 'get_children', 'get_parent', 'longest_match', 'longest_match_many',
+        'delete', 'delete_subtree', 'delete_many',
+    )
+    # The walks down the trie, and how to tell the number of node hops from what each one returns
+    _instrumented_walks = {
+        '_insert_node': lambda node: node.depth,
+        '_traverse_node': lambda result: len(result[0]),
+        '_match_keys': lambda result: result[1],
+        '_delete_keys': lambda hops: hops,
+    }
+
+    @property
+    def instrumentation(self):
+        return self._instrumentation
+
+    @instrumentation.setter
+    def instrumentation(self, instrumentation):
+        # Operations are only wrapped while instrumentation is attached
+        previous = self.__dict__.get('_instrumentation')
+        self._instrumentation = instrumentation
+        if instrumentation is not None or previous is not None:
+            from .instrumentation import instrument
+            instrument(self, instrumentation)
 
     def _get_root(self) -> IPSubnetNode:
         return self._root
 
+    def __reduce__(self):
+        """
+        Pickles the trie as one byte per node instead of a graph of node objects.
+
+        The journal and the instrumentation stay with the original trie.
+        """
+        return _unpickle_trie, (type(self), _pack_nodes(self._root), self.serializer)
+
     def insert(self, ip_subnet):
         """
         Inserts an IP subnet into the trie.
@@ -40,7 +93,23 @@ class BaseIPSubnetTrie(IPSubnetTrie):
         Returns:
             None
         """
-        ip_parts, netmask = self._parse_ip_subnet(ip_subnet)        
+        ip_parts, netmask = self._parse_ip_subnet(ip_subnet)
+        self._insert_node(ip_parts, netmask)
+        # Journaled only once the IP/subnet turned out to be valid, the IPv4 octets are parsed lazily
+        if self.journal:
+            self.journal.append(INSERT, ip_subnet)
+
+    def _insert_node(self, ip_parts, netmask: int) -> IPSubnetNode:
+        """
+        Walks down the trie along the given IP subnet, creating the missing nodes.
+
+        Args:
+            ip_parts (list): The IP address of the subnet, split into parts and converted to integers.
+            netmask (int): The netmask of the subnet.
+
+        Returns:
+            IPSubnetNode: The node of the IP subnet, marked as holding it.
+        """
         node = self._root
         depth = 0
         for bit in self._bit_iterator(ip_parts):
@@ -53,6 +122,7 @@ class BaseIPSubnetTrie(IPSubnetTrie):
                 
         node.is_end = True
         node.depth = depth
+        return node
 
     def _bit_iterator(self, ip_parts: list[int]):
         raise NotImplementedError("Must be implemented by subclass")
@@ -68,9 +138,9 @@ class BaseIPSubnetTrie(IPSubnetTrie):
             str or False: The string representation of the found IP subnet if found, False otherwise.
         """
         ip, netmask = self._parse_ip_subnet(ip_subnet)        
-        _, node = self._traverse_node(ip, netmask)
+        parents, node = self._traverse_node(ip, netmask)
         
-        return self._get_node_representation(node) if node and node.is_end else False
+        return self._format_ip_address(self._path(parents), netmask) if node and node.is_end else False
     
     def _parse_ip_subnet(self, ip_subnet: str) -> (list[int], int):
         raise NotImplementedError("Must be implemented by subclass")
@@ -102,30 +172,20 @@ class BaseIPSubnetTrie(IPSubnetTrie):
         node = node if depth == netmask and node.is_end else None
         return parents, node
     
-    def _get_node_representation(self, node: IPSubnetNode):
+    def _path(self, parents) -> list[int]:
         """
-        Returns the string representation of a node in the trie.
+        Returns the bits of the path walked down to a node.
+
+        The representation of a node is formatted from the path already
+        walked to it, rather than found by searching the trie for the node.
 
         Args:
-            node (IPSubnetNode): The node to get the representation of.
+            parents (list): The list of parent-child pairs leading to the node.
 
         Returns:
-            str: The string representation of the node.
-        """
-        def traverse(current_node: IPSubnetNode, path: list, depth: int):
-            if current_node is node:
-                return self._format_ip_address(path, depth)
-            if current_node.children[0] is not None:
-                result = traverse(current_node.children[0], path + [0], depth + 1)
-                if result is not None:
-                    return result
-            if current_node.children[1] is not None:
-                result = traverse(current_node.children[1], path + [1], depth + 1)
-                if result is not None:
-                    return result
-            return None
-
-        return traverse(self._root, [], 0)
+            list: The bits of the path.
+        """
+        return [bit for _, bit in parents]
     
     def _format_ip_address(self, path, depth):
         raise NotImplementedError("Must be implemented by subclass")
@@ -141,26 +201,27 @@ class BaseIPSubnetTrie(IPSubnetTrie):
             list: A list of string representations of the children.
         """
         ip, netmask = self._parse_ip_subnet(ip_subnet)
-        _, node = self._traverse_node(ip, netmask)
+        parents, node = self._traverse_node(ip, netmask)
         if node is None:
             return []
-        return self._dfs(node, include_self=False)
+        return self._dfs(node, self._path(parents), include_self=False)
     
-    def _dfs(self, node, include_self=True):
+    def _dfs(self, node, path, include_self=True):
         """
         Performs a depth-first search starting from the given node.
 
         Args:
             node (IPSubnetNode): The starting node of the search.
+            path (list): The bits of the path to the starting node.
             include_self (bool): Whether to include the starting node in the result.
 
         Returns:
             list: A list of string representations of the nodes visited during the search.
         """
-        result = [self._get_node_representation(node)] if (node.is_end and include_self) else []
-        for child in node.children:
+        result = [self._format_ip_address(list(path), len(path))] if (node.is_end and include_self) else []
+        for bit, child in enumerate(node.children):
             if child is not None:
-                result.extend(self._dfs(child))
+                result.extend(self._dfs(child, path + [bit]))
         return result
     
     def get_parent(self, ip_subnet: str):
@@ -178,18 +239,103 @@ class BaseIPSubnetTrie(IPSubnetTrie):
         parents, node = self._traverse_node(ip_parts, netmask)
         if not parents or not node:
             return None
-        nearest_parent = self._get_nearest_parent(parents)
-        if not nearest_parent:
+        depth = self._get_nearest_parent(parents)
+        if depth is None:
             return None
 
-        return self._get_node_representation(nearest_parent)
+        return self._format_ip_address(self._path(parents[:depth]), depth)
     
-    def _get_nearest_parent(self, parents: list[TrieNode]) -> TrieNode:
-        for parent, _ in reversed(parents):
-            if parent.is_end:
-                return parent
+    def _get_nearest_parent(self, parents: list[TrieNode]) -> int:
+        # The depth of the nearest parent holding an IP/subnet
+        for depth in range(len(parents) - 1, -1, -1):
+            if parents[depth][0].is_end:
+                return depth
         return None
     
+    def longest_match(self, ip_subnet: str):
+        """
+        Returns the most specific IP subnet in the trie that covers the given IP subnet.
+
+        Args:
+            ip_subnet (str): The IP address or subnet to match.
+
+        Returns:
+            str: The representation of the longest matching IP subnet, or None if nothing matches.
+        """
+        return self.longest_match_many([ip_subnet])[0]
+
+    def longest_match_many(self, ip_subnets):
+        """
+        Returns the longest match of many IP subnets in a single pass over the trie.
+
+        The IP subnets are sorted by their bits, so the path shared by
+        consecutive IP subnets is walked once.
+
+        Args:
+            ip_subnets (iterable): The IP addresses or subnets to match.
+
+        Returns:
+            list: The representation of the longest match of every IP subnet, or None
+                  where nothing matches, in the order of the input.
+
+        Raises:
+            ValueError: If an IP subnet is not a whole address or its netmask is too long.
+        """
+        keys = []
+        for ip_subnet in ip_subnets:
+            ip_parts, netmask = self._parse_ip_subnet(ip_subnet)
+            key = self._key(ip_parts, netmask)
+            if len(key) != netmask:
+                raise ValueError(f'Invalid IP subnet {ip_subnet!r}')
+            keys.append(key)
+        return self._match_keys(keys)[0]
+
+    def _key(self, ip_parts, netmask: int) -> list[int]:
+        # The bits of the path to the IP subnet
+        key = []
+        for bit in self._bit_iterator(ip_parts):
+            if len(key) >= netmask:
+                break
+            key.append(bit)
+        return key
+
+    def _match_keys(self, keys: list[list[int]]) -> tuple:
+        """
+        Finds the longest match of every key in a single sweep over the trie, in sorted order.
+
+        Args:
+            keys (list): The bits of the paths to the IP subnets to match.
+
+        Returns:
+            tuple: The representation of the longest match of every key, or None
+                   where nothing matches, and the number of nodes walked.
+        """
+        results = [None] * len(keys)
+        hops = 0
+        path = []
+        nodes = [self._root]
+        matches = [0 if self._root.is_end else None]  # The deepest match along the path
+        for i in sorted(range(len(keys)), key=keys.__getitem__):
+            key = keys[i]
+            common = 0
+            while common < len(path) and common < len(key) and path[common] == key[common]:
+                common += 1
+            del path[common:], nodes[common + 1:], matches[common + 1:]
+
+            for bit in key[common:]:
+                child = nodes[-1].children[bit]
+                if child is None:
+                    break
+                path.append(bit)
+                nodes.append(child)
+                matches.append(len(path) if child.is_end else matches[-1])
+            hops += len(path) - common
+
+            match = matches[-1]
+            if match is not None:
+                results[i] = self._format_ip_address(path[:match], match)
+        return results, hops
+
     def delete(self, ip_subnet: str):
         """
         Deletes an IP subnet from the trie.
@@ -203,6 +349,8 @@ class BaseIPSubnetTrie(IPSubnetTrie):
         ip, netmask = self._parse_ip_subnet(ip_subnet)
         parents, node = self._traverse_node(ip, netmask)
         if node:
+            if self.journal:
+                self.journal.append(DELETE, ip_subnet)
             self._remove_node(parents, node)
 
     def _remove_node(self, parents, node):
@@ -217,14 +365,122 @@ class BaseIPSubnetTrie(IPSubnetTrie):
             None
         """
         node.is_end = False  # Remove the IP/subnet
+        self._prune(parents)
+
+    def _prune(self, parents):
+        """
+        Detaches the nodes left without children and without an IP/subnet, bottom-up.
+
+        Args:
+            parents (list): The list of parent-child pairs leading to the deepest node to check.
+
+        Returns:
+            None
+        """
+        for parent, bit in reversed(parents):
+            if not self._prune_child(parent, bit):
+                break
+
+    def _prune_child(self, parent: IPSubnetNode, bit: int) -> bool:
+        child = parent.children[bit]
+        if child is not None and (child.is_end or child.children[0] is not None or child.children[1] is not None):
+            return False
+        parent.children[bit] = None
+        return True
+
+    def delete_subtree(self, ip_subnet: str):
+        """
+        Deletes an IP subnet and everything under it from the trie.
+
+        The subtree is detached from its parent in one step, so the cost does
+        not depend on how many more specific subnets it holds.
+
+        Args:
+            ip_subnet (str): The IP subnet to be deleted along with its children.
+
+        Returns:
+            None
+        """
+        ip_parts, netmask = self._parse_ip_subnet(ip_subnet)
+        # Every part is parsed before anything is cleared, the IPv4 octets are parsed lazily
+        ip_parts = list(ip_parts)
+        if netmask == 0:
+            if self.journal:
+                self.journal.append(DELETE_SUBTREE, ip_subnet)
+            self._root = IPSubnetNode()
+            return
+
+        parents, _ = self._traverse_node(ip_parts, netmask)
+        if len(parents) != netmask:
+            return  # Nothing stored under the IP/subnet
+
+        if self.journal:
+            self.journal.append(DELETE_SUBTREE, ip_subnet)
+        parent, bit = parents.pop()
+        parent.children[bit] = None
+        self._prune(parents)
+
+    def delete_many(self, ip_subnets):
+        """
+        Deletes many IP subnets from the trie in a single sweep.
 
-        # If the node has no children and is not an end node, remove it
-        if not any(node.children) and not node.is_end:
-            for parent, bit in reversed(parents):
-                if not any(parent.children[bit].children) and not parent.children[bit].is_end:
-                    parent.children[bit] = None
-                else:
+        The subnets are sorted by their bits, so the path shared by
+        consecutive subnets is walked once and every node is pruned at most
+        once, when the sweep leaves it for good.
+
+        Args:
+            ip_subnets (iterable): The IP subnets to be deleted.
+
+        Returns:
+            None
+        """
+        keys = []
+        for ip_subnet in ip_subnets:
+            ip_parts, netmask = self._parse_ip_subnet(ip_subnet)
+            key = self._key(ip_parts, netmask)
+            if len(key) == netmask:
+                keys.append((key, ip_subnet))
+        keys.sort(key=lambda item: item[0])
+        self._delete_keys(keys)
+
+    def _delete_keys(self, keys: list[tuple]) -> int:
+        """
+        Deletes the IP subnets in a single sweep over the trie.
+
+        Args:
+            keys (list): The bits of the path to every IP subnet and the IP subnet, sorted by the bits.
+
+        Returns:
+            int: The number of nodes walked.
+        """
+        hops = 0
+        parents = []  # The parent-child pairs leading to the current node
+        for key, ip_subnet in keys:
+            # Back up to the path shared with the previous subnet, pruning on the way
+            common = 0
+            while common < len(parents) and common < len(key) and parents[common][1] == key[common]:
+                common += 1
+            while len(parents) > common:
+                parent, bit = parents.pop()
+                self._prune_child(parent, bit)
+
+            node = parents[-1][0].children[parents[-1][1]] if parents else self._root
+            for bit in key[common:]:
+                if node.children[bit] is None:
                     break
+                parents.append((node, bit))
+                node = node.children[bit]
+            else:
+                if node.is_end:
+                    if self.journal:
+                        self.journal.append(DELETE, ip_subnet)
+                    node.is_end = False
+            hops += len(parents) - common
+
+        while parents:
+            parent, bit = parents.pop()
+            self._prune_child(parent, bit)
+        return hops
 
     def serialize(self):
         """
@@ -251,11 +507,64 @@ class BaseIPSubnetTrie(IPSubnetTrie):
             raise ValueError('No serializer specified')
         self._root = self.serializer.deserialize(serialized_string)
 
+    def stats(self) -> dict:
+        """
+        Returns the size and shape of the trie.
+
+        Returns:
+            dict: The number of nodes, the number of nodes holding an IP subnet
+                  (terminals), histograms of the prefix lengths and of the node
+                  depths, the estimated bytes taken by the nodes, and the number
+                  of single-child chain nodes: nodes without an IP subnet and
+                  with one child, which path compression would remove.
+        """
+        node_count = terminal_count = single_child_count = 0
+        prefix_lengths = {}
+        depths = {}
+        stack = [(self._root, 0)]
+        while stack:
+            node, depth = stack.pop()
+            node_count += 1
+            depths[depth] = depths.get(depth, 0) + 1
+            if node.is_end:
+                terminal_count += 1
+                prefix_lengths[depth] = prefix_lengths.get(depth, 0) + 1
+            children = [child for child in node.children if child is not None]
+            if len(children) == 1 and not node.is_end:
+                single_child_count += 1
+            for child in children:
+                stack.append((child, depth + 1))
+
+        # Measured on a spare node, reading __dict__ of the trie's nodes would grow them
+        sample = IPSubnetNode()
+        node_bytes = sys.getsizeof(sample) + sys.getsizeof(sample.__dict__) + sys.getsizeof(sample.children)
+        return {
+            'node_count': node_count,
+            'terminal_count': terminal_count,
+            'prefix_length_histogram': dict(sorted(prefix_lengths.items())),
+            'depth_histogram': dict(sorted(depths.items())),
+            'estimated_bytes': node_count * node_bytes,
+            'single_child_count': single_child_count,
+        }
+
+    def compact(self):
+        """
+        Folds the journal into a new snapshot in the background.
+
+        Returns:
+            threading.Thread: The thread doing the compaction.
+        """
+        if not self.journal:
+            raise ValueError('No journal specified')
+        return self.journal.compact(self)
+
 
 class IPv4SubnetTrie(BaseIPSubnetTrie):
     """
     A specialized trie data structure for storing and manipulating IPv4 subnets.
     """
+
+    _address_bits = 32
     
     def _bit_iterator(self, ip_parts):
         for part in ip_parts:
@@ -279,6 +588,8 @@ class IPv6SubnetTrie(BaseIPSubnetTrie):
     A trie data structure for storing and searching IP/subnets (v6).
     """
 
+    _address_bits = 128
+
     def _bit_iterator(self, ip_parts):
         for part in ip_parts:
             for i in range(15, -1, -1):
@@ -1,8 +1,65 @@
 import json
+from collections import deque
 
-from . import binary_trie_pb2
 from .base import *
 
+
+def _binary_trie_pb2():
+    # Imported on first use, so that the protobuf runtime is only loaded by users of this serializer
+    from . import binary_trie_pb2
+    return binary_trie_pb2
+
+
+def _pack_nodes(root: IPSubnetNode) -> bytes:
+    """
+    Encodes the nodes of a trie in one byte per node, in breadth-first order.
+
+    Bit 0 of every byte is the node's is_end flag, bits 1 and 2 tell whether
+    it has a zero and a one child.
+
+    Args:
+        root (IPSubnetNode): The root node of the trie.
+
+    Returns:
+        bytes: The encoded nodes.
+    """
+    data = bytearray()
+    queue = deque([root])
+    while queue:
+        node = queue.popleft()
+        zero, one = node.children
+        data.append(node.is_end | (zero is not None) << 1 | (one is not None) << 2)
+        if zero is not None:
+            queue.append(zero)
+        if one is not None:
+            queue.append(one)
+    return bytes(data)
+
+
+def _unpack_nodes(data: bytes) -> IPSubnetNode:
+    """
+    Decodes the nodes encoded by _pack_nodes.
+
+    Args:
+        data (bytes): The encoded nodes.
+
+    Returns:
+        IPSubnetNode: The root node of the trie.
+    """
+    root = IPSubnetNode()
+    queue = deque([root])
+    for flags in data:
+        node = queue.popleft()
+        node.is_end = bool(flags & 1)
+        if flags & 2:
+            child = node.children[0] = IPSubnetNode(node.depth + 1)
+            queue.append(child)
+        if flags & 4:
+            child = node.children[1] = IPSubnetNode(node.depth + 1)
+            queue.append(child)
+    return root
+
+
 class IPSubnetJsonSerializer(TrieJsonSerializer):
     """
     Serializer class for converting IPSubnet trie to JSON format and vice versa.
@@ -60,7 +117,7 @@ class IPSubnetProtobufSerializer(TrieProtobufSerializer):
         Returns:
             bytes: The serialized binary data representing the IPSubnetTrie.
         """
-        nodes_proto = binary_trie_pb2.BinaryTrieNodes()
+        nodes_proto = _binary_trie_pb2().BinaryTrieNodes()
 
         root = trie._get_root()
         if root is None:
@@ -91,7 +148,7 @@ class IPSubnetProtobufSerializer(TrieProtobufSerializer):
         Returns:
             IPSubnetNode: The root node of the deserialized binary trie.
         """
-        nodes_proto = binary_trie_pb2.BinaryTrieNodes()
+        nodes_proto = _binary_trie_pb2().BinaryTrieNodes()
         nodes_proto.ParseFromString(s)
 
         if not nodes_proto.nodes:
@@ -3,7 +3,7 @@ from setuptools import setup, find_packages
 setup(
     name='IP-Subnet-Trie',
     version='1.0',
-    packages=find_packages(),
+    packages=find_packages(exclude=['benchmarks', 'benchmarks.*']),
     description='An efficient data structure for handling a large number of IP addresses/subnets in a hierarchy.',
     long_description=open('README.md').read(),
     long_description_content_type='text/markdown',
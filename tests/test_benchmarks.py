@@ -0,0 +1,39 @@
+from benchmarks.datasets import DATASETS, covering_prefixes, ipv6_bgp, skewed_lookups
+from benchmarks.suite import IMPORTS, compare, run, run_imports
+
+from ip_subnet_trie import IPv6SubnetTrie
+
+def test_datasets():
+    for generate, _ in DATASETS.values():
+        prefixes = generate(500, seed=1)
+        assert prefixes == generate(500, seed=1)
+        assert len(set(prefixes)) == 500
+
+    trie = IPv6SubnetTrie()
+    for prefix in ipv6_bgp(500):
+        trie.insert(prefix)
+        assert trie.search(prefix)
+
+    lookups = skewed_lookups(list(range(1000)), 10000)
+    assert sum(1 for i in lookups if i < 100) > 4000
+
+def test_run_and_compare():
+    results = run(['ipv4-24'], [200], imports=False, lookups=100, budget=0.1, memory_sample=10)
+    assert {result['operation'] for result in results['results']} == {
+        'insert', 'search', 'get_parent', 'get_children', 'json_serialize', 'json_deserialize',
+        'protobuf_serialize', 'protobuf_deserialize', 'pickle_dumps', 'pickle_loads', 'delete',
+    }
+    assert all(result['ops'] and result['peak_bytes'] is not None for result in results['results'])
+    assert not any(comparison['regression'] for comparison in compare(results, results))
+
+    slower = {'results': [dict(result, ns_per_op=result['ns_per_op'] * 2) for result in results['results']]}
+    assert all(comparison['regression'] for comparison in compare(results, slower))
+
+def test_run_imports():
+    results = run_imports(repeat=1)
+    assert [result['operation'] for result in results] == list(IMPORTS)
+    assert all(result['seconds'] > 0 for result in results)
+
+def test_covering_prefixes():
+    assert covering_prefixes(['10.1.2.0/24', '10.1.3.0/24', '10.2.0.0/24', '0.0.0.0/4']) == ['10.1.0.0/16', '10.2.0.0/16']
+    assert covering_prefixes(['2001:db8:abcd::/48']) == ['2001:db8:ab00::/40']
@@ -0,0 +1,27 @@
+import io
+
+from ip_subnet_trie.__main__ import main
+from ip_subnet_trie.classify import classify, read_chunks
+from ip_subnet_trie.snapshot import load_snapshot
+
+def test_read_chunks():
+    data = b'10.0.0.1\n10.0.0.2\n10.0.0.3\n10.0.0.4'
+    chunks = list(read_chunks([io.BytesIO(data), io.BytesIO(b'10.0.0.5\n')], chunk_size=7))
+    assert b''.join(chunks) == data + b'\n10.0.0.5\n'
+    assert all(chunk.endswith(b'\n') for chunk in chunks)
+
+def test_build_and_classify(tmp_path):
+    prefixes = tmp_path / 'prefixes.txt'
+    prefixes.write_text('# Private ranges\n10.0.0.0/8\n10.1.0.0/16  # More specific\n\n192.168.0.0/16\n')
+    for snapshot in [str(tmp_path / 'tree.pb'), str(tmp_path / 'tree.json')]:
+        assert main(['build', str(prefixes), '-o', snapshot]) == 0
+        assert set(load_snapshot(snapshot).get_children('10.0.0.0/8')) == {'10.1.0.0/16'}
+
+    addresses = b''.join(b'10.%d.%d.1\n' % (i % 3, i % 256) for i in range(5000)) + b'8.8.8.8\nnot-an-ip\n10.1.2\n10.0.0.1/40\n'
+    expected = b''.join(
+        b'10.%d.%d.1\t%s\n' % (i % 3, i % 256, b'10.1.0.0/16' if i % 3 == 1 else b'10.0.0.0/8') for i in range(5000)
+    )
+    for workers in [0, 2]:
+        output = io.BytesIO()
+        classify(str(tmp_path / 'tree.pb'), [io.BytesIO(addresses)], output, workers=workers, chunk_size=4096)
+        assert output.getvalue() == expected
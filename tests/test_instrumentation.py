@@ -0,0 +1,64 @@
+import pytest
+
+from ip_subnet_trie import IPv4SubnetTrie, TrieInstrumentation
+
+def test_stats():
+    trie = IPv4SubnetTrie()
+    assert trie.stats()['node_count'] == 1
+    trie.insert('10.0.0.0/8')
+    trie.insert('10.0.0.0/9')
+    trie.insert('10.128.0.0/9')
+    trie.insert('10.1.2.3')
+
+    stats = trie.stats()
+    assert stats['node_count'] == 1 + 9 + 1 + 23
+    assert stats['terminal_count'] == 4
+    assert stats['prefix_length_histogram'] == {8: 1, 9: 2, 32: 1}
+    assert stats['depth_histogram'][0] == 1
+    assert stats['depth_histogram'][9] == 2
+    assert sum(stats['depth_histogram'].values()) == stats['node_count']
+    # The root, the /8 chain, then the chain from the /9 down to the /32
+    assert stats['single_child_count'] == 8 + 22
+    assert stats['estimated_bytes'] > 0
+
+def test_instrumentation():
+    trie = IPv4SubnetTrie()
+    trie.insert('10.0.0.0/8')
+    assert trie.instrumentation is None
+
+    trie.instrumentation = TrieInstrumentation()
+    trie.insert('10.1.0.0/16')
+    trie.insert('10.1.2.3')
+    assert trie.search('10.1.0.0/16') == '10.1.0.0/16'
+    assert trie.search('11.0.0.0/8') is False
+    assert trie.longest_match('10.1.2.4') == '10.1.0.0/16'
+    with pytest.raises(ValueError):
+        trie.search('10.x.0.0/16')
+
+    metrics = trie.instrumentation.to_dict()
+    assert metrics['insert']['count'] == 2
+    assert metrics['insert']['hops'] == 16 + 32
+    assert metrics['search']['count'] == 3
+    assert metrics['search']['errors'] == 1
+    assert metrics['search']['max_hops'] == 16
+    assert sum(metrics['search']['latency_histogram_ns'].values()) == 3
+    # longest_match goes through longest_match_many, recorded as one operation
+    assert metrics['longest_match']['count'] == 1
+    assert 'longest_match_many' not in metrics
+
+    trie.instrumentation.reset()
+    assert trie.instrumentation.to_dict() == {}
+
+def test_instrumentation_detach():
+    trie = IPv4SubnetTrie()
+    instrumentation = TrieInstrumentation()
+    trie.instrumentation = instrumentation
+    trie.delete_many(['10.0.0.0/8'])
+    assert instrumentation.to_dict()['delete_many']['count'] == 1
+    # Other tries are not affected
+    assert IPv4SubnetTrie().insert.__func__ is IPv4SubnetTrie.insert
+
+    trie.instrumentation = None
+    assert 'insert' not in vars(trie) and '_traverse_node' not in vars(trie)
+    trie.insert('10.0.0.0/8')
+    assert 'insert' not in instrumentation.to_dict()
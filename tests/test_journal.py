@@ -0,0 +1,106 @@
+import os
+
+import pytest
+
+from ip_subnet_trie import IPv4SubnetTrie, IPv6SubnetTrie, TrieJournal
+from ip_subnet_trie.operations import INSERT
+
+def test_journal_replay(tmp_path):
+    journal = TrieJournal(str(tmp_path))
+    trie = IPv4SubnetTrie(journal=journal)
+    trie.insert('10.0.0.0/8')
+    trie.insert('10.1.0.0/16')
+    trie.insert('10.1.2.3')
+    trie.delete('10.1.0.0/16')
+    trie.delete('10.9.0.0/16')  # Not in the trie, nothing to journal
+    journal.close()
+
+    journal = TrieJournal(str(tmp_path))
+    trie = IPv4SubnetTrie(journal=journal)
+    journal.load(trie)
+    assert set(trie.get_children('10.0.0.0/8')) == {'10.1.2.3/32'}
+    assert trie.search('10.1.0.0/16') is False
+
+    # Replaying does not journal the changes again
+    trie.insert('10.2.0.0/16')
+    journal.close()
+    trie = IPv4SubnetTrie()
+    TrieJournal(str(tmp_path)).load(trie)
+    assert set(trie.get_children('10.0.0.0/8')) == {'10.1.2.3/32', '10.2.0.0/16'}
+
+def test_journal_torn_tail(tmp_path):
+    journal = TrieJournal(str(tmp_path))
+    trie = IPv6SubnetTrie(journal=journal)
+    trie.insert('2001:db8::/32')
+    trie.insert('::/0')
+    journal.close()
+    path = os.path.join(str(tmp_path), 'journal.1.log')
+    os.truncate(path, os.path.getsize(path) - 2)
+
+    journal = TrieJournal(str(tmp_path))
+    trie = IPv6SubnetTrie(journal=journal)
+    journal.load(trie)
+    assert trie.search('2001:db8::/32') == '2001:db8::/32'
+    assert trie.search('::/0') is False
+    trie.insert('::/0')
+    journal.close()
+
+    trie = IPv6SubnetTrie()
+    TrieJournal(str(tmp_path)).load(trie)
+    assert trie.search('::/0') == '::/0'
+
+def test_journal_compact(tmp_path):
+    journal = TrieJournal(str(tmp_path))
+    trie = IPv4SubnetTrie(journal=journal)
+    trie.insert('192.168.0.0/24')
+    trie.insert('192.168.0.1')
+    trie.compact().join()
+    trie.insert('192.168.0.2')
+    trie.delete('192.168.0.1')
+    trie.compact().join()
+    trie.insert('192.168.0.3')
+    journal.close()
+    assert sorted(os.listdir(str(tmp_path))) == ['journal.3.log', 'snapshot.2.pb']
+
+    trie = IPv4SubnetTrie()
+    TrieJournal(str(tmp_path)).load(trie)
+    assert set(trie.get_children('192.168.0.0/24')) == {'192.168.0.2/32', '192.168.0.3/32'}
+
+    with pytest.raises(ValueError):
+        trie.compact()
+
+def test_journal_bulk_delete(tmp_path):
+    journal = TrieJournal(str(tmp_path))
+    trie = IPv4SubnetTrie(journal=journal)
+    for subnet in ['10.0.0.0/8', '10.1.0.0/16', '10.1.2.3', '10.2.0.0/16', '11.0.0.0/8']:
+        trie.insert(subnet)
+    trie.delete_subtree('10.1.0.0/16')
+    trie.delete_many(['11.0.0.0/8', '10.2.0.0/16'])
+    journal.close()
+
+    trie = IPv4SubnetTrie()
+    TrieJournal(str(tmp_path)).load(trie)
+    assert trie.search('10.0.0.0/8') == '10.0.0.0/8'
+    assert trie.get_children('0.0.0.0/0') == []
+    assert trie.search('11.0.0.0/8') is False
+
+def test_journal_failed_insert(tmp_path):
+    journal = TrieJournal(str(tmp_path))
+    trie = IPv4SubnetTrie(journal=journal)
+    trie.insert('10.0.0.0/8')
+    with pytest.raises(ValueError):
+        trie.insert('10.x.0.0/16')
+    trie.insert('10.1.0.0/16')
+    journal.close()
+    assert os.path.getsize(os.path.join(str(tmp_path), 'journal.1.log')) == 2 * 3 + len('10.0.0.0/8') + len('10.1.0.0/16')
+
+    # A bad record written by an older version is skipped, not fatal
+    journal = TrieJournal(str(tmp_path))
+    journal.append(INSERT, '10.x.0.0/16')
+    journal.append(INSERT, '10.2.0.0/16')
+    trie = IPv4SubnetTrie(journal=journal)
+    journal.load(trie)
+    assert set(trie.get_children('10.0.0.0/8')) == {'10.1.0.0/16', '10.2.0.0/16'}
+    trie.compact().join()
+    journal.close()
+    assert 'snapshot.1.pb' in os.listdir(str(tmp_path))
@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+
+from ip_subnet_trie import IPv4SubnetTrie, IPSubnetProtobufSerializer
+from ip_subnet_trie.server import TrieServer, TrieClient, run_load
+
+def _write_snapshot(path, subnets):
+    trie = IPv4SubnetTrie(serializer=IPSubnetProtobufSerializer())
+    for subnet in subnets:
+        trie.insert(subnet)
+    with open(path, 'wb') as f:
+        f.write(trie.serialize())
+    return trie
+
+def test_longest_match():
+    trie = IPv4SubnetTrie()
+    trie.insert('10.0.0.0/8')
+    trie.insert('10.1.0.0/16')
+    trie.insert('10.1.2.3')
+    assert trie.longest_match('10.1.2.3') == '10.1.2.3/32'
+    assert trie.longest_match('10.1.2.4') == '10.1.0.0/16'
+    assert trie.longest_match('10.1.0.0/12') == '10.0.0.0/8'
+    assert trie.longest_match('11.0.0.0') is None
+    assert trie.longest_match_many(['10.2.0.1', '11.0.0.0', '10.1.2.3', '10.1.9.9']) == \
+        ['10.0.0.0/8', None, '10.1.2.3/32', '10.1.0.0/16']
+    trie.insert('0.0.0.0/0')
+    assert trie.longest_match('11.0.0.0') == '0.0.0.0/0'
+
+def test_longest_match_invalid():
+    trie = IPv4SubnetTrie()
+    trie.insert('10.0.0.0/8')
+    trie.insert('10.1.0.0/16')
+    for ip_subnet in ['10.1.2', '10.0.0.1/40', '10.x.0.1']:
+        with pytest.raises(ValueError):
+            trie.longest_match(ip_subnet)
+    with pytest.raises(ValueError):
+        trie.longest_match_many(['10.1.2.3', '10.1.2'])
+
+def test_server(tmp_path):
+    snapshot = str(tmp_path / 'trie.pb')
+    _write_snapshot(snapshot, ['10.0.0.0/8', '10.1.0.0/16', '10.1.2.3'])
+
+    async def scenario():
+        server = TrieServer(IPv4SubnetTrie(), snapshot)
+        await server.reload()
+        await server.start(str(tmp_path / 'trie.sock'))
+        client = await TrieClient.connect(str(tmp_path / 'trie.sock'))
+
+        results = await asyncio.gather(*(client.longest_match(ip) for ip in ['10.1.2.3', '10.9.9.9', '11.0.0.0']))
+        assert results == ['10.1.2.3/32', '10.0.0.0/8', None]
+        assert server.batches == 1  # Pipelined in the same tick, answered in one pass
+        assert await client.search('10.1.0.0/16') == '10.1.0.0/16'
+        assert await client.search('10.2.0.0/16') is False
+        assert set(await client.get_children('10.0.0.0/8')) == {'10.1.0.0/16', '10.1.2.3/32'}
+        assert await client.get_children('11.0.0.0/8') == []
+        with pytest.raises(ValueError):
+            await client.longest_match('2001:db8::1')
+        with pytest.raises(ValueError):
+            await client.longest_match('10.1.2')
+        assert await client.longest_match('10.1.2.3') == '10.1.2.3/32'
+
+        # Reload a new snapshot on the open connection
+        _write_snapshot(snapshot, ['11.0.0.0/8'])
+        await server.reload()
+        assert await client.longest_match('11.1.1.1') == '11.0.0.0/8'
+        assert await client.longest_match('10.1.2.3') is None
+
+        result = await run_load(['11.0.0.1', '12.0.0.1'], 200, 4, str(tmp_path / 'trie.sock'))
+        assert result['requests'] == 200
+        assert result['p50_us'] <= result['p99_us']
+
+        await client.close()
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(scenario())
+
+def test_server_large_trie(tmp_path):
+    # Answers are formatted from the path walked, not by searching the whole trie for the node
+    subnets = ['10.0.0.0/8'] + [f'10.{i >> 8}.{i & 255}.0/24' for i in range(0, 65536, 2)]
+    trie = IPv4SubnetTrie()
+    for subnet in subnets:
+        trie.insert(subnet)
+
+    async def scenario():
+        server = TrieServer(trie)
+        await server.start(str(tmp_path / 'trie.sock'))
+        client = await TrieClient.connect(str(tmp_path / 'trie.sock'))
+        queries = subnets[::30] + ['10.0.1.0/24']
+        results = await asyncio.gather(*(client.search(subnet) for subnet in queries))
+        assert results == queries[:-1] + [False]
+        assert await client.get_children('10.0.0.0/8') == subnets[1:]
+        await client.close()
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(asyncio.wait_for(scenario(), 30))
+
+def test_client_connection_lost(tmp_path):
+    async def scenario():
+        server = TrieServer(IPv4SubnetTrie())
+        await server.start(str(tmp_path / 'trie.sock'))
+        client = await TrieClient.connect(str(tmp_path / 'trie.sock'))
+        # An oversized request makes the server drop the connection
+        with pytest.raises(ConnectionError):
+            await client.longest_match('1' * 2000)
+        with pytest.raises(ConnectionError):
+            await client.longest_match('10.0.0.1')
+        await client.close()
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(asyncio.wait_for(scenario(), 10))
@@ -0,0 +1,134 @@
+import multiprocessing
+import os
+import uuid
+
+import pytest
+
+from ip_subnet_trie import (
+    IPv4SubnetTrie, IPv6SubnetTrie,
+    SharedIPSubnetTrieView, SharedIPSubnetTriePublisher, SharedIPSubnetTrieReader,
+)
+from ip_subnet_trie.shared_trie import _attach_shared_memory, _create_shared_memory, _flatten_trie
+
+def _worker_search(name, ip_subnet):
+    with SharedIPSubnetTrieReader(name) as reader:
+        return reader.view().search(ip_subnet)
+
+def _crashing_publisher(name):
+    trie = IPv4SubnetTrie()
+    trie.insert('172.16.0.0/12')
+    publisher = SharedIPSubnetTriePublisher(name)
+    publisher.publish(trie)
+    publisher.publish(trie)
+    os._exit(1)  # Dies without close()
+
+def test_flat_view():
+    trie = IPv4SubnetTrie()
+    trie.insert('10.255.249.0/24')
+    trie.insert('10.255.249.64/26')
+    trie.insert('10.255.249.104')
+    trie.insert('10.255.249.105')
+    trie.insert('0.0.0.0/0')
+
+    view = SharedIPSubnetTrieView(_flatten_trie(trie))
+    assert view.search('10.255.249.0/24') == '10.255.249.0/24'
+    assert view.search('10.255.249.104') == '10.255.249.104/32'
+    assert view.search('10.255.249.106') is False
+    assert view.search('10.255.249') is False
+    assert set(view.get_children('10.255.249.0/24')) == set(trie.get_children('10.255.249.0/24'))
+    assert set(view.get_children('0.0.0.0/0')) == set(trie.get_children('0.0.0.0/0'))
+    assert view.get_parent('10.255.249.104') == '10.255.249.64/26'
+    assert view.get_parent('10.255.249.64/26') == '10.255.249.0/24'
+    assert view.get_parent('10.255.249.0/24') == '0.0.0.0/0'
+    assert view.get_parent('10.255.249.23') is None
+    view.close()
+
+    trie = IPv6SubnetTrie()
+    trie.insert('2001:db8::/32')
+    trie.insert('2001:db8:abcd::1')
+    trie.insert('::/0')
+    view = SharedIPSubnetTrieView(_flatten_trie(trie))
+    assert view.search('2001:db8:abcd::1') == trie.search('2001:db8:abcd::1')
+    assert view.get_parent('2001:db8:abcd::1') == '2001:db8::/32'
+    assert set(view.get_children('::/0')) == set(trie.get_children('::/0'))
+
+    with pytest.raises(ValueError):
+        SharedIPSubnetTrieView(b'\0' * 16)
+    with pytest.raises(ValueError):
+        SharedIPSubnetTrieView(b'IPST')
+    data = _flatten_trie(trie)
+    for missing in [1, 20]:
+        with pytest.raises(ValueError):
+            SharedIPSubnetTrieView(data[:-missing])
+
+def test_publish_and_rotate():
+    name = 'ipst_' + uuid.uuid4().hex[:12]
+    trie = IPv4SubnetTrie()
+    trie.insert('192.168.0.0/24')
+
+    with SharedIPSubnetTriePublisher(name) as publisher, SharedIPSubnetTrieReader(name) as reader:
+        assert reader.view() is None
+        assert publisher.publish(trie) == 1
+        old_view = reader.view()
+        assert old_view.search('192.168.0.0/24') == '192.168.0.0/24'
+        assert reader.view() is old_view
+
+        trie.insert('192.168.1.0/24')
+        assert publisher.publish(trie) == 2
+        # Lookups keep hitting generation 1 until the reader switches over
+        assert old_view.search('192.168.1.0/24') is False
+        assert reader.view().search('192.168.1.0/24') == '192.168.1.0/24'
+        assert reader.generation == 2
+
+        # Generation 1 is unlinked, the reader skips straight to the latest one
+        trie.insert('192.168.2.0/24')
+        publisher.publish(trie)
+        publisher.publish(trie)
+        assert reader.view().search('192.168.2.0/24') == '192.168.2.0/24'
+        assert reader.generation == 4
+
+        with multiprocessing.get_context('spawn').Pool(2) as pool:
+            results = pool.starmap(_worker_search, [(name, '192.168.2.0/24'), (name, '10.0.0.0/8')])
+        assert results == ['192.168.2.0/24', False]
+
+def test_publisher_restart():
+    name = 'ipst_' + uuid.uuid4().hex[:12]
+    process = multiprocessing.get_context('spawn').Process(target=_crashing_publisher, args=(name,))
+    process.start()
+    process.join()
+    assert process.exitcode == 1
+    # A block created right before the crash, never published
+    _create_shared_memory(f'{name}_3', 16).close()
+
+    with SharedIPSubnetTrieReader(name) as reader:
+        assert reader.view().search('172.16.0.0/12') == '172.16.0.0/12'
+        assert reader.generation == 2
+
+        trie = IPv4SubnetTrie()
+        trie.insert('10.0.0.0/8')
+        with SharedIPSubnetTriePublisher(name) as publisher:
+            assert publisher.generation == 2
+            assert publisher.publish(trie) == 3
+            assert reader.view().search('10.0.0.0/8') == '10.0.0.0/8'
+            # Generation 1 was taken over and rotated out like any other
+            with pytest.raises(FileNotFoundError):
+                _attach_shared_memory(f'{name}_1')
+
+    for block in [name, f'{name}_2', f'{name}_3']:
+        with pytest.raises(FileNotFoundError):
+            _attach_shared_memory(block)
+
+def test_reader_keeps_previous_view():
+    name = 'ipst_' + uuid.uuid4().hex[:12]
+    trie = IPv4SubnetTrie()
+    trie.insert('10.0.0.0/8')
+    with SharedIPSubnetTriePublisher(name, keep=2) as publisher, SharedIPSubnetTrieReader(name) as reader:
+        publisher.publish(trie)
+        first = reader.view()
+        publisher.publish(trie)
+        reader.view()
+        # Still usable by a thread that fetched it before the switch-over
+        assert first.search('10.0.0.0/8') == '10.0.0.0/8'
+        publisher.publish(trie)
+        reader.view()
+        assert first._buffer is None  # Closed two generations later
@@ -1,3 +1,8 @@
+import os
+import pickle
+import subprocess
+import sys
+
 import pytest
 
 from ip_subnet_trie import IPv4SubnetTrie, IPSubnetJsonSerializer, IPSubnetProtobufSerializer
@@ -103,3 +108,93 @@ def test_serialize():
         trie.deserialize(f.read())
     assert trie.search('0.0.0.0') == '0.0.0.0/32'
     
+
+def _count_nodes(node):
+    return 1 + sum(_count_nodes(child) for child in node.children if child is not None)
+
+def _build(subnets):
+    trie = IPv4SubnetTrie()
+    for subnet in subnets:
+        trie.insert(subnet)
+    return trie._get_root()
+
+def test_delete_subtree():
+    trie = IPv4SubnetTrie()
+    trie.insert('10.0.0.0/8')
+    trie.insert('10.1.0.0/16')
+    trie.insert('10.1.2.0/24')
+    trie.insert('10.1.2.3')
+    trie.insert('10.2.0.0/16')
+    trie.insert('11.0.0.0/8')
+
+    trie.delete_subtree('10.1.0.0/16')
+    assert set(trie.get_children('10.0.0.0/8')) == {'10.2.0.0/16'}
+    assert trie.search('10.1.2.3') is False
+    assert _count_nodes(trie._get_root()) == _count_nodes(_build(['10.0.0.0/8', '10.2.0.0/16', '11.0.0.0/8']))
+
+    # Prunes the ancestors left empty, even when the prefix itself is not stored
+    trie.delete_subtree('11.0.0.0/12')
+    assert trie.search('11.0.0.0/8') == '11.0.0.0/8'
+    trie.delete_subtree('11.0.0.0/8')
+    assert trie.get_children('0.0.0.0/0') == []
+    trie.insert('0.0.0.0/0')
+    assert set(trie.get_children('0.0.0.0/0')) == {'10.0.0.0/8', '10.2.0.0/16'}
+
+    # Bad octets raise before the trie is cleared
+    for ip_subnet in ['garbage/0', '10.x/0']:
+        with pytest.raises(ValueError):
+            trie.delete_subtree(ip_subnet)
+    assert trie.search('0.0.0.0/0') == '0.0.0.0/0'
+    assert trie.search('10.2.0.0/16') == '10.2.0.0/16'
+
+    trie.delete_subtree('0.0.0.0/0')
+    assert trie.search('0.0.0.0/0') is False
+    assert trie._get_root().children == [None, None]
+
+def test_delete_many():
+    trie = IPv4SubnetTrie()
+    subnets = ['10.0.0.0/8', '10.1.0.0/16', '10.1.2.0/24', '10.1.2.3', '10.1.2.4', '10.2.0.0/16', '192.168.0.0/24']
+    for subnet in subnets:
+        trie.insert(subnet)
+
+    trie.delete_many(['10.1.2.4', '10.1.0.0/16', '10.1.2.3', '10.9.0.0/16', '192.168.0.0/24', '10.1.2.3', '10.1.2'])
+    assert set(trie.get_children('10.0.0.0/8')) == {'10.1.2.0/24', '10.2.0.0/16'}
+    assert trie.search('192.168.0.0/24') is False
+    assert _count_nodes(trie._get_root()) == _count_nodes(_build(['10.0.0.0/8', '10.1.2.0/24', '10.2.0.0/16']))
+
+    trie.delete_many(['10.2.0.0/16', '10.0.0.0/8', '10.1.2.0/24'])
+    assert trie._get_root().children == [None, None]
+
+def test_lazy_protobuf_import():
+    script = (
+        'import sys; from ip_subnet_trie import IPv4SubnetTrie, IPSubnetProtobufSerializer; '
+        'IPv4SubnetTrie().insert("10.0.0.0/8"); '
+        'assert "google.protobuf" not in sys.modules; '
+        'assert not {"logging", "threading", "ip_subnet_trie.journal", "ip_subnet_trie.instrumentation"} & set(sys.modules); '
+        'IPSubnetProtobufSerializer().serialize(IPv4SubnetTrie()); '
+        'assert "google.protobuf" in sys.modules'
+    )
+    subprocess.run([sys.executable, '-c', script], check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    script = (
+        'import sys; from ip_subnet_trie import *; '
+        'assert "google.protobuf" not in sys.modules; '
+        'IPSubnetJsonSerializer, IPSubnetProtobufSerializer, TrieJournal, TrieInstrumentation, '
+        'SharedIPSubnetTrieView, SharedIPSubnetTriePublisher, SharedIPSubnetTrieReader'
+    )
+    subprocess.run([sys.executable, '-c', script], check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def test_pickle():
+    trie = IPv4SubnetTrie(serializer=IPSubnetJsonSerializer())
+    for subnet in ['0.0.0.0/0', '10.0.0.0/8', '10.1.2.0/24', '10.1.2.3', '192.168.0.1']:
+        trie.insert(subnet)
+    copy = pickle.loads(pickle.dumps(trie))
+    assert type(copy) is IPv4SubnetTrie
+    assert isinstance(copy.serializer, IPSubnetJsonSerializer)
+    assert copy.serialize() == trie.serialize()
+    assert set(copy.get_children('0.0.0.0/0')) == set(trie.get_children('0.0.0.0/0'))
+    assert copy.get_parent('10.1.2.3') == '10.1.2.0/24'
+    assert copy._get_root().children[0].children[0].depth == 2
+
+    empty = pickle.loads(pickle.dumps(IPv4SubnetTrie()))
+    assert empty.search('0.0.0.0/0') is False
@@ -1,3 +1,5 @@
+import pickle
+
 import pytest
 
 from ip_subnet_trie import IPv6SubnetTrie, IPSubnetJsonSerializer, IPSubnetProtobufSerializer
@@ -104,4 +106,12 @@ def test_get_parent():
     with pytest.raises(ValueError):
         trie.serialize()
     with pytest.raises(ValueError):
-        trie.deserialize('')
\ No newline at end of file
+        trie.deserialize('')
+
+def test_pickle():
+    trie = IPv6SubnetTrie()
+    trie.insert('2001:db8::/32')
+    trie.insert('2001:db8:abcd:12:ffff:ffff:ffff:ffff/128')
+    copy = pickle.loads(pickle.dumps(trie))
+    assert copy.search('2001:db8:abcd:12:ffff:ffff:ffff:ffff') == '2001:db8:abcd:12:ffff:ffff:ffff:ffff/128'
+    assert copy.get_parent('2001:db8:abcd:12:ffff:ffff:ffff:ffff') == '2001:db8::/32'